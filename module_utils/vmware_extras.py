@@ -0,0 +1,1270 @@
+# -*- coding: utf-8 -*-
+#
+# (c) 2015, Joseph Callen <jcallen () csc.com>
+# Portions Copyright (c) 2015 VMware, Inc. All rights reserved.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Helpers shared by the vcenter and vio modules: vCenter session reuse
+through the session cache and vcenter_session_broker, paged inventory
+lookups, parallel per host calls and task waits, appliance readiness
+waits and the native OVA deployer.
+
+Modules import it after ansible.module_utils.vmware:
+
+    from ansible.module_utils.basic import *
+    from ansible.module_utils.vmware import *
+    from ansible.module_utils.vmware_extras import *
+"""
+
+try:
+    import collections
+    import fcntl
+    import hashlib
+    import json
+    import os
+    import random
+    import re
+    import socket
+    import ssl
+    import tarfile
+    import threading
+    import time
+    import requests
+    from multiprocessing.pool import ThreadPool
+    from pyVim import connect
+    from pyVmomi import vim, vmodl, SoapStubAdapter, VmomiSupport
+    HAS_PYVMOMI = True
+except ImportError:
+    HAS_PYVMOMI = False
+
+from ansible.module_utils.vmware import connect_to_api, wait_for_task
+
+# the modules star import this file after their own helpers, keep it from
+# replacing their wait_for_task and the other names they define themselves
+__all__ = ['broker_session', 'broker_request', 'connect_to_api_cached', 'broker_find_by_name',
+           'find_vcenter_object_by_name', 'find_vds_portgroup_by_name', 'get_all_objs_props',
+           'TaskWaiterTimeout', 'TaskWaiter', 'run_host_tasks', 'run_on_hosts', 'query_hosts_vsan_disks',
+           'ReadinessProbe', 'wait_for_task_updates', 'wait_for_vm', 'OvaMemberStream', 'OvaDeployer']
+
+
+broker_session = {}
+
+
+def broker_request(module, request):
+    """
+    Send request to the vcenter_session_broker for this vCenter and user
+    when VMWARE_SESSION_BROKER is set, returns None if no broker answers
+    """
+    broker_dir = os.environ.get('VMWARE_SESSION_BROKER')
+    if not broker_dir:
+        return None
+
+    name = hashlib.sha1("%s@%s" % (module.params['username'], module.params['hostname'])).hexdigest()
+    request.update({'auth': hashlib.sha256(module.params['password']).hexdigest()})
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(30)
+
+    try:
+        sock.connect(os.path.join(os.path.expanduser(broker_dir), name + '.sock'))
+        sock.sendall(json.dumps(request) + '\n')
+        reply = sock.makefile().readline()
+    except (socket.error, socket.timeout):
+        return None
+    finally:
+        sock.close()
+
+    if not reply:
+        return None
+
+    reply = json.loads(reply)
+    if 'error' in reply:
+        return None
+
+    return reply
+
+
+def connect_to_api_cached(module, disconnect_atexit=True):
+    """
+    connect_to_api with an opt-in shared session. If VMWARE_SESSION_BROKER
+    is set and a vcenter_session_broker is running, its session is used.
+    Otherwise, if VMWARE_SESSION_CACHE is set to a directory, a cached
+    vmware_soap_session cookie younger than VMWARE_SESSION_CACHE_TTL
+    (seconds, default 1200) is reused before logging in again.
+    Shared sessions are not logged out at exit so later tasks can reuse them.
+    """
+    hostname = module.params['hostname']
+    username = module.params['username']
+
+    ssl_context = None
+    if not module.params['validate_certs']:
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+    session = broker_request(module, {'op': 'session'})
+    if session:
+        stub = SoapStubAdapter(host=hostname, version=session['version'], sslContext=ssl_context)
+        stub.cookie = session['cookie']
+        broker_session['module'] = module
+        return vim.ServiceInstance('ServiceInstance', stub).RetrieveContent()
+
+    cache_dir = os.environ.get('VMWARE_SESSION_CACHE')
+    if not cache_dir:
+        return connect_to_api(module, disconnect_atexit)
+
+    ttl = int(os.environ.get('VMWARE_SESSION_CACHE_TTL', 1200))
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, 0o700)
+
+    cache_file = os.path.join(cache_dir, hashlib.sha1("%s@%s" % (username, hostname)).hexdigest())
+
+    with open(cache_file + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        if os.path.isfile(cache_file) and (time.time() - os.path.getmtime(cache_file)) < ttl:
+            with open(cache_file) as f:
+                cookie = f.read().strip()
+
+            stub = connect.SmartStubAdapter(host=hostname, sslContext=ssl_context)
+            stub.cookie = cookie
+            content = vim.ServiceInstance('ServiceInstance', stub).RetrieveContent()
+
+            try:
+                if content.sessionManager.currentSession:
+                    return content
+            except vim.fault.NotAuthenticated:
+                pass
+
+        content = connect_to_api(module, disconnect_atexit=False)
+
+        fd = os.open(cache_file + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content.sessionManager._stub.cookie)
+        os.rename(cache_file + '.tmp', cache_file)
+
+    return content
+
+
+def broker_find_by_name(content, vimtype, name):
+    """
+    Resolve name through the broker inventory cache, falls back to a
+    direct inventory read if the broker stopped answering
+    """
+    reply = broker_request(broker_session['module'], {'op': 'lookup', 'type': vimtype._wsdlName, 'name': name})
+
+    if reply is None:
+        objs = get_all_objs_props(content, [vimtype])
+        return next((obj for obj, props in objs.items() if props['name'] == name), None)
+
+    if not reply['moid']:
+        return None
+
+    return VmomiSupport.GetWsdlType('urn:vim25', reply['type'])(reply['moid'], content.rootFolder._stub)
+
+
+def find_vcenter_object_by_name(content, vimtype, object_name, root=None):
+    """
+    Returns the managed object of vimtype named object_name, under root
+    (a folder, datacenter or compute resource) when given, None if there
+    is none
+    """
+    if broker_session and root is None:
+        return broker_find_by_name(content, vimtype, object_name)
+
+    vcenter_object = get_all_objs_props(content, [vimtype], root=root)
+
+    for k, v in vcenter_object.items():
+        if v['name'] == object_name:
+            return k
+    else:
+        return None
+
+
+def find_vds_portgroup_by_name(content, vds, portgroup_name):
+    """
+    Returns the portgroup named portgroup_name on vds, None if there is none
+    """
+    portgroups = get_all_objs_props(content, [vim.dvs.DistributedVirtualPortgroup],
+                                    ['name', 'config.distributedVirtualSwitch'])
+
+    for pg, pg_props in portgroups.items():
+        if pg_props['name'] == portgroup_name and pg_props.get('config.distributedVirtualSwitch') == vds:
+            return pg
+    return None
+
+
+def get_all_objs_props(content, vimtype, props=None, page_size=1000, root=None):
+    """
+    Retrieve props (default: name) for every managed object of vimtype in
+    the inventory, or under root, with a single paged PropertyCollector
+    call rather than one round trip per object.
+    Returns a dict of {managed_object: {property_name: value}}
+    """
+    props = props or ['name']
+    collector = content.propertyCollector
+    container = content.viewManager.CreateContainerView(root or content.rootFolder, vimtype, True)
+
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+        name='traverseEntities',
+        path='view',
+        skip=False,
+        type=vim.view.ContainerView
+    )
+    object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+        obj=container,
+        skip=True,
+        selectSet=[traversal_spec]
+    )
+    property_specs = [
+        vmodl.query.PropertyCollector.PropertySpec(type=t, pathSet=props, all=False) for t in vimtype
+    ]
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[object_spec],
+        propSet=property_specs
+    )
+    options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+
+    objs = {}
+    try:
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        while result:
+            for object_content in result.objects:
+                objs[object_content.obj] = dict((p.name, p.val) for p in object_content.propSet)
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        container.Destroy()
+
+    return objs
+
+
+class TaskWaiterTimeout(Exception):
+    pass
+
+
+class TaskWaiter(object):
+    """
+    Tracks many tasks through one private PropertyCollector and returns
+    each task as soon as it completes
+    """
+
+    def __init__(self, content, timeout=3600):
+        self.collector = content.propertyCollector.CreatePropertyCollector()
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+        self.version = ''
+        self.tasks = {}
+
+    def add(self, task, key):
+        """
+        Start tracking task, key is returned with the task result
+        :param task: vim.Task()
+        :param key: hashable
+        """
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=task, skip=False)
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.Task,
+            pathSet=['info.state', 'info.result', 'info.error'],
+            all=False
+        )
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec],
+            propSet=[property_spec]
+        )
+        task_filter = self.collector.CreateFilter(filter_spec, True)
+        self.tasks[task._moId] = {'key': key, 'filter': task_filter, 'info': {}}
+
+    def pending(self):
+        return len(self.tasks)
+
+    def pending_keys(self):
+        return [tracked['key'] for tracked in self.tasks.values()]
+
+    def wait_any(self):
+        """
+        Blocks until at least one tracked task completes
+        :return: list of (key, success, result), result is the task error on failure
+        """
+        done = []
+
+        while self.tasks and not done:
+            remaining = int(self.deadline - time.time())
+            if remaining <= 0:
+                raise TaskWaiterTimeout("Timed out after %s seconds waiting for %s tasks" % (self.timeout,
+                                                                                           len(self.tasks)))
+
+            wait_options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=min(remaining, 60))
+            update = self.collector.WaitForUpdatesEx(self.version, wait_options)
+            if update is None:
+                continue
+            self.version = update.version
+
+            for filter_update in update.filterSet:
+                for object_update in filter_update.objectSet:
+                    tracked = self.tasks.get(object_update.obj._moId)
+                    if not tracked:
+                        continue
+
+                    for change in object_update.changeSet:
+                        tracked['info'][change.name] = change.val
+
+                    state = tracked['info'].get('info.state')
+                    if state == vim.TaskInfo.State.success:
+                        done.append((tracked['key'], True, tracked['info'].get('info.result')))
+                    elif state == vim.TaskInfo.State.error:
+                        done.append((tracked['key'], False, tracked['info'].get('info.error')))
+                    else:
+                        continue
+
+                    del self.tasks[object_update.obj._moId]
+                    tracked['filter'].DestroyPropertyFilter()
+
+        return done
+
+    def close(self):
+        self.collector.DestroyPropertyCollector()
+
+
+def run_host_tasks(module, content, hosts, submit_task, max_parallel_hosts):
+    """
+    Calls submit_task(host) for each host keeping at most max_parallel_hosts
+    of the returned tasks in flight, the next host is started as soon as any
+    running task completes. Fails the module with the results so far when
+    the tasks do not complete in time
+    :param hosts: list of vim.HostSystem()
+    :param submit_task: callable returning vim.Task()
+    :return: dict, {host.name: {'changed': bool, 'result': str, 'duration': float}}
+    """
+    pending_hosts = collections.deque(hosts)
+    start_times = {}
+    results = {}
+
+    waiter = TaskWaiter(content)
+
+    try:
+        while pending_hosts or waiter.pending():
+            while pending_hosts and waiter.pending() < max_parallel_hosts:
+                host = pending_hosts.popleft()
+                start_times[host.name] = time.time()
+
+                try:
+                    waiter.add(submit_task(host), host.name)
+                except Exception as e:
+                    results[host.name] = {'changed': False, 'result': str(e), 'duration': 0}
+
+            for host_name, success, result in waiter.wait_any():
+                duration = round(time.time() - start_times[host_name], 1)
+                results[host_name] = {'changed': success, 'result': str(result), 'duration': duration}
+    except TaskWaiterTimeout as e:
+        for host_name in waiter.pending_keys():
+            duration = round(time.time() - start_times[host_name], 1)
+            results[host_name] = {'changed': False, 'result': str(e), 'duration': duration}
+        for host in pending_hosts:
+            results[host.name] = {'changed': False, 'result': 'not started', 'duration': 0}
+        module.fail_json(msg=str(e), result=results)
+    finally:
+        waiter.close()
+
+    return results
+
+
+def run_on_hosts(hosts, host_func, max_parallel_hosts):
+    """
+    Runs host_func(host) for each host on a pool of max_parallel_hosts
+    threads, for per host calls that return directly instead of a task
+    :return: list of host_func results, in hosts order
+    """
+    if not hosts:
+        return []
+
+    pool = ThreadPool(min(max(1, max_parallel_hosts), len(hosts)))
+
+    try:
+        return pool.map(host_func, hosts)
+    finally:
+        pool.close()
+
+
+def query_hosts_vsan_disks(hosts, disk_results, max_parallel_hosts):
+    """
+    Runs a single QueryDisksForVsan() per host missing from disk_results, in
+    parallel across hosts, and keeps the answers in disk_results by host moId
+    so later calls in the same module run do not query again
+    :param hosts: list of vim.HostSystem()
+    :param disk_results: dict, {host._moId: list of vim.vsan.host.DiskResult()}
+    :return: list of lists of vim.vsan.host.DiskResult(), in hosts order
+    """
+    missing = [h for h in hosts if h._moId not in disk_results]
+
+    if missing:
+        query_results = run_on_hosts(missing, lambda h: h.configManager.vsanSystem.QueryDisksForVsan(),
+                                     max_parallel_hosts)
+
+        for host, results in zip(missing, query_results):
+            disk_results[host._moId] = results
+
+    return [disk_results[h._moId] for h in hosts]
+
+
+class ReadinessProbe(object):
+    """
+    Polls an url through one pooled session until it answers with the
+    expected status or deadline seconds have passed. The sleep between
+    probes starts at initial_sleep and doubles, with jitter, up to
+    max_sleep so a service is seen within about max_sleep of coming up.
+    timeline records the offset, latency and outcome of every probe.
+    """
+
+    def __init__(self, deadline=450, initial_sleep=0.1, max_sleep=1.0, timeout=5, verify=False):
+        self.deadline = deadline
+        self.initial_sleep = initial_sleep
+        self.max_sleep = max_sleep
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.timeline = []
+        self.elapsed = None
+
+    def wait(self, url, status=200, **kwargs):
+        start = time.time()
+        sleep = self.initial_sleep
+
+        try:
+            while True:
+                probe_start = time.time()
+                try:
+                    resp = self.session.get(url, timeout=self.timeout, **kwargs)
+                    outcome = resp.status_code
+                except requests.exceptions.RequestException as e:
+                    outcome = e.__class__.__name__
+
+                self.timeline.append({'offset': round(probe_start - start, 3),
+                                      'latency': round(time.time() - probe_start, 3),
+                                      'result': outcome})
+
+                if outcome == status:
+                    self.elapsed = round(time.time() - start, 2)
+                    return True
+
+                remaining = self.deadline - (time.time() - start)
+                if remaining <= 0:
+                    return False
+
+                time.sleep(min(remaining, random.uniform(sleep / 2, sleep)))
+                sleep = min(sleep * 2, self.max_sleep)
+        finally:
+            self.session.close()
+
+    def report(self):
+        return {'ready_after': self.elapsed, 'probes': len(self.timeline), 'timeline': self.timeline}
+
+
+def wait_for_task_updates(task, timeout=3600, progress_callback=None):
+    """
+    Block until task completes using a PropertyCollector filter on the task
+    info so the wait returns as soon as vCenter reports a state change.
+    progress_callback, if given, is called with (task, progress) whenever
+    info.progress changes. Raises an Exception on task error or when the
+    task has not completed within timeout seconds.
+    """
+    service_instance = vim.ServiceInstance('ServiceInstance', task._stub)
+    collector = service_instance.content.propertyCollector.CreatePropertyCollector()
+
+    object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=task, skip=False)
+    property_spec = vmodl.query.PropertyCollector.PropertySpec(
+        type=vim.Task,
+        pathSet=['info.state', 'info.progress', 'info.result', 'info.error'],
+        all=False
+    )
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[object_spec],
+        propSet=[property_spec]
+    )
+    collector.CreateFilter(filter_spec, True)
+
+    deadline = time.time() + timeout
+    version = ''
+    task_info = {}
+
+    try:
+        while True:
+            remaining = int(deadline - time.time())
+            if remaining <= 0:
+                raise Exception("Timed out after %s seconds waiting for task: %s" % (timeout, task._moId))
+
+            wait_options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=min(remaining, 60))
+            update = collector.WaitForUpdatesEx(version, wait_options)
+            if update is None:
+                continue
+            version = update.version
+
+            changed_props = []
+            for filter_update in update.filterSet:
+                for object_update in filter_update.objectSet:
+                    for change in object_update.changeSet:
+                        task_info[change.name] = change.val
+                        changed_props.append(change.name)
+
+            if progress_callback and 'info.progress' in changed_props:
+                progress_callback(task, task_info.get('info.progress'))
+
+            state = task_info.get('info.state')
+            if state == vim.TaskInfo.State.success:
+                return True, task_info.get('info.result')
+            if state == vim.TaskInfo.State.error:
+                if task_info.get('info.error') is None:
+                    raise Exception("An unknown error has occurred")
+                raise Exception(task_info['info.error'])
+    finally:
+        collector.DestroyPropertyCollector()
+
+
+def wait_for_vm(vm, timeout=600):
+    """
+    Block until the guest of vm is up: powered on, tools running and an ip
+    address reported, using a PropertyCollector filter so changes are seen
+    as soon as vCenter reports them. Returns a dict with the seconds at
+    which each property first reached its ready value, or None when the
+    vm is powered off, inaccessible or not ready within timeout seconds.
+    """
+    service_instance = vim.ServiceInstance('ServiceInstance', vm._stub)
+    collector = service_instance.content.propertyCollector.CreatePropertyCollector()
+
+    object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=vm, skip=False)
+    property_spec = vmodl.query.PropertyCollector.PropertySpec(
+        type=vim.VirtualMachine,
+        pathSet=['runtime.powerState', 'runtime.connectionState', 'guest.toolsRunningStatus',
+                 'guestHeartbeatStatus', 'guest.ipAddress'],
+        all=False
+    )
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[object_spec],
+        propSet=[property_spec]
+    )
+    collector.CreateFilter(filter_spec, True)
+
+    ready_values = {
+        'runtime.powerState': lambda v: v == vim.VirtualMachinePowerState.poweredOn,
+        'guest.toolsRunningStatus': lambda v: v == 'guestToolsRunning',
+        'guestHeartbeatStatus': lambda v: v == 'green',
+        'guest.ipAddress': lambda v: bool(v),
+    }
+
+    start = time.time()
+    deadline = start + timeout
+    version = ''
+    vm_props = {}
+    milestones = {}
+
+    try:
+        while True:
+            remaining = int(deadline - time.time())
+            if remaining <= 0:
+                return None
+
+            wait_options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=min(remaining, 60))
+            update = collector.WaitForUpdatesEx(version, wait_options)
+            if update is None:
+                continue
+            version = update.version
+
+            for filter_update in update.filterSet:
+                for object_update in filter_update.objectSet:
+                    for change in object_update.changeSet:
+                        vm_props[change.name] = change.val
+
+            for name, is_ready in ready_values.items():
+                if name not in milestones and is_ready(vm_props.get(name)):
+                    milestones[name] = round(time.time() - start, 2)
+
+            if vm_props.get('runtime.connectionState') in ('inaccessible', 'invalid', 'orphaned') or \
+                    vm_props.get('runtime.powerState') in ('poweredOff', 'suspended'):
+                return None
+
+            if all(name in milestones for name in ('runtime.powerState', 'guest.toolsRunningStatus',
+                                                   'guest.ipAddress')):
+                return {'ready_after': round(time.time() - start, 2),
+                        'ip_address': vm_props['guest.ipAddress'],
+                        'milestones': milestones}
+    finally:
+        collector.DestroyPropertyCollector()
+
+
+class OvaMemberStream(object):
+    """
+    File like view of one member of the OVA tar, read in place from the
+    archive so the upload does not extract the disk first. httplib sends it
+    with read() and requests takes the Content-Length from len(). Bytes read
+    are passed to progress every chunk_size bytes and at the end.
+    """
+
+    def __init__(self, path, offset, size, chunk_size, progress):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.remaining = size
+        self.unreported = 0
+        self.f = None
+
+    def __len__(self):
+        return self.size
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            self.close()
+            return b''
+
+        if self.f is None:
+            self.f = open(self.path, 'rb')
+            self.f.seek(self.offset)
+
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        block = self.f.read(size)
+        if not block:
+            self.close()
+            raise IOError("Unexpected end of {}".format(self.path))
+
+        self.remaining -= len(block)
+        self.unreported += len(block)
+        if self.unreported >= self.chunk_size or self.remaining <= 0:
+            self.progress(self.unreported)
+            self.unreported = 0
+        return block
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+class OvaDeployer(object):
+    """
+    Deploys an OVA without ovftool. The OVF descriptor is read from the tar,
+    ResourcePool.ImportVApp creates the vm or vApp and every disk is streamed
+    straight out of the tar to its HttpNfcLease url, max_parallel_uploads at
+    a time, while the lease progress is kept up to date.
+    """
+
+    def __init__(self, module, content, ova_file, max_parallel_uploads=4,
+                 chunk_size=1024 * 1024, progress_interval=30, proxy=None,
+                 hash_cache=None, hash_block_size=4 * 1024 * 1024, max_parallel_hashes=4,
+                 upload_slot_dir=None, upload_slots=1, upload_rate_limit=None):
+        self.module = module
+        self.content = content
+        self.ova_file = ova_file
+        self.max_parallel_uploads = max_parallel_uploads
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.proxy = proxy
+        self.hash_cache = os.path.expanduser(hash_cache) if hash_cache else None
+        self.hash_block_size = hash_block_size
+        self.max_parallel_hashes = max_parallel_hashes
+        self.upload_slot_dir = os.path.expanduser(upload_slot_dir) if upload_slot_dir else None
+        self.upload_slots = max(upload_slots, 1)
+        self.upload_rate_limit = upload_rate_limit
+        self.upload_start = None
+        self.descriptor = None
+        self.manifest = None
+        self.members = {}
+        self.hashes = None
+        self.hashes_cached = False
+        self.entity = None
+        self.networks = {}
+        self.bytes_total = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    def read_ova(self):
+        if self.descriptor:
+            return
+
+        try:
+            tar = tarfile.open(self.ova_file, 'r:')
+        except (IOError, tarfile.TarError) as e:
+            self.module.fail_json(msg="Failed to open OVA {}: {}".format(self.ova_file, str(e)))
+
+        try:
+            for member in tar.getmembers():
+                if not member.isfile():
+                    continue
+                self.members[os.path.basename(member.name)] = (member.offset_data, member.size)
+                if member.name.endswith('.ovf'):
+                    self.descriptor = tar.extractfile(member).read()
+                if member.name.endswith('.mf'):
+                    self.manifest = tar.extractfile(member).read()
+        finally:
+            tar.close()
+
+        if not self.descriptor:
+            self.module.fail_json(msg="No OVF descriptor found in {}".format(self.ova_file))
+
+    def find_targets(self, datacenter_name, cluster_name, datastore_name):
+        datacenter = find_vcenter_object_by_name(self.content, vim.Datacenter, datacenter_name)
+        if not datacenter:
+            self.module.fail_json(msg="Failed to find datacenter {}".format(datacenter_name))
+
+        cluster = find_vcenter_object_by_name(self.content, vim.ComputeResource, cluster_name,
+                                              datacenter.hostFolder)
+        if not cluster:
+            self.module.fail_json(msg="Failed to find cluster {}".format(cluster_name))
+
+        datastores = get_all_objs_props(self.content, [vim.Datastore], root=datacenter)
+        cluster_datastores = cluster.datastore
+        try:
+            datastore = [d for d, props in datastores.items()
+                         if props['name'] == datastore_name and d in cluster_datastores][0]
+        except IndexError:
+            self.module.fail_json(msg="Failed to find datastore {}".format(datastore_name))
+
+        host = None
+        if isinstance(cluster, vim.ClusterComputeResource) and not cluster.configurationEx.drsConfig.enabled:
+            mounted = [m.key for m in datastore.host]
+            hosts = [h for h in cluster.host if h in mounted and
+                     h.runtime.connectionState == 'connected' and not h.runtime.inMaintenanceMode]
+            if not hosts:
+                self.module.fail_json(msg="No connected host in {} mounts {}".format(cluster_name, datastore_name))
+            host = hosts[0]
+
+        return datacenter, cluster, datastore, host
+
+    def datacenter_networks(self, datacenter):
+        """
+        Returns {name: network} for the networks of datacenter, read in one
+        PropertyCollector call
+        """
+        networks = get_all_objs_props(self.content, [vim.Network], root=datacenter.networkFolder)
+        return dict((props['name'], network) for network, props in networks.items())
+
+    def network_mapping(self, datacenter, networks):
+        """
+        networks maps OVF network names to portgroup names, the key '*'
+        maps every OVF network not named explicitly
+        """
+        parse_params = vim.OvfManager.ParseDescriptorParams()
+        parsed = self.content.ovfManager.ParseDescriptor(self.descriptor, parse_params)
+        portgroups = self.datacenter_networks(datacenter)
+
+        mapping = []
+        for ovf_network in parsed.network or []:
+            portgroup_name = networks.get(ovf_network.name, networks.get('*'))
+            if not portgroup_name:
+                continue
+            if portgroup_name not in portgroups:
+                self.module.fail_json(msg="Failed to find network {}".format(portgroup_name))
+            mapping.append(vim.OvfManager.NetworkMapping(name=ovf_network.name,
+                                                         network=portgroups[portgroup_name]))
+            self.networks[ovf_network.name] = portgroup_name
+        return mapping
+
+    def import_spec(self, cluster, datastore, network_mapping, name, disk_mode, properties,
+                    deployment_option=None, ip_protocol=None):
+        spec_params = vim.OvfManager.CreateImportSpecParams(
+            entityName=name,
+            diskProvisioning=disk_mode,
+            networkMapping=network_mapping,
+            propertyMapping=[vim.KeyValue(key=k, value=str(v)) for k, v in properties.items()]
+        )
+        if deployment_option:
+            spec_params.deploymentOption = deployment_option
+        if ip_protocol:
+            spec_params.ipProtocol = ip_protocol
+
+        spec_result = self.content.ovfManager.CreateImportSpec(self.descriptor, cluster.resourcePool,
+                                                               datastore, spec_params)
+        if spec_result.error:
+            self.module.fail_json(msg="Failed to create import spec: {}".format(
+                ', '.join(e.msg for e in spec_result.error)))
+
+        return spec_result
+
+    def wait_for_lease(self, lease, timeout=300):
+        deadline = time.time() + timeout
+        while lease.state == vim.HttpNfcLease.State.initializing:
+            if time.time() > deadline:
+                return False
+            time.sleep(1)
+        return lease.state == vim.HttpNfcLease.State.ready
+
+    def sent(self, count):
+        ahead = 0
+        with self.lock:
+            self.bytes_sent += count
+            if self.upload_rate_limit:
+                ahead = self.bytes_sent / float(self.upload_rate_limit) - (time.time() - self.upload_start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def acquire_upload_slot(self, datastore_name):
+        """
+        Blocks until one of the upload_slots lock files of datastore_name in
+        upload_slot_dir is locked, so deploys running in other processes
+        take turns uploading to the same datastore. Returns the locked file,
+        None without upload_slot_dir
+        """
+        if not self.upload_slot_dir:
+            return None
+
+        try:
+            os.makedirs(self.upload_slot_dir, 0o700)
+        except OSError:
+            if not os.path.isdir(self.upload_slot_dir):
+                raise
+
+        name = hashlib.sha1(datastore_name.encode('utf-8')).hexdigest()
+        while True:
+            for slot in range(self.upload_slots):
+                lock_file = open(os.path.join(self.upload_slot_dir, '{}.{}.lock'.format(name, slot)), 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return lock_file
+                except IOError:
+                    lock_file.close()
+            time.sleep(1)
+
+    def keep_lease(self, lease, stop):
+        while not stop.wait(self.progress_interval):
+            with self.lock:
+                percent = int(self.bytes_sent * 100 / max(self.bytes_total, 1))
+            try:
+                lease.HttpNfcLeaseProgress(min(percent, 99))
+            except Exception:
+                pass
+
+    def upload(self, session, upload_item):
+        file_item, url = upload_item
+        offset, size = self.members[os.path.basename(file_item.path)]
+        stream = OvaMemberStream(self.ova_file, offset, size, self.chunk_size, self.sent)
+        headers = {'Content-Type': 'application/x-vnd.vmware-streamVmdk'}
+        method = 'PUT' if file_item.create else 'POST'
+
+        start = time.time()
+        try:
+            resp = session.request(method, url, data=stream, headers=headers)
+        finally:
+            stream.close()
+        resp.raise_for_status()
+        duration = max(time.time() - start, 0.001)
+
+        return {'path': file_item.path, 'bytes': size,
+                'duration': round(duration, 2), 'bytes_per_second': int(size / duration)}
+
+    def upload_items(self, spec_result, lease):
+        urls = dict((d.importKey, d.url.replace('*', self.module.params['hostname']))
+                    for d in lease.info.deviceUrl)
+        items = []
+        for file_item in spec_result.fileItem or []:
+            if os.path.basename(file_item.path) not in self.members:
+                raise IOError("{} is not in {}".format(file_item.path, self.ova_file))
+            items.append((file_item, urls[file_item.deviceId]))
+        return items
+
+    def deploy(self, datacenter_name, cluster_name, datastore_name, name, disk_mode, networks,
+               properties, deployment_option=None, ip_protocol=None, power_on=True):
+        """
+        Returns a dict with the moId of the new entity, total bytes, duration,
+        bytes_per_second and the same figures for each disk, plus the seconds
+        spent waiting for an upload slot
+        """
+        self.read_ova()
+        datacenter, cluster, datastore, host = self.find_targets(datacenter_name, cluster_name, datastore_name)
+        network_mapping = self.network_mapping(datacenter, networks)
+        spec_result = self.import_spec(cluster, datastore, network_mapping, name, disk_mode,
+                                       properties, deployment_option, ip_protocol)
+
+        slot_wait = time.time()
+        upload_slot = self.acquire_upload_slot(datastore_name)
+        slot_wait = round(time.time() - slot_wait, 2)
+
+        try:
+            lease = cluster.resourcePool.ImportVApp(spec_result.importSpec, datacenter.vmFolder, host)
+            if not self.wait_for_lease(lease):
+                error = lease.error.msg if lease.error else lease.state
+                self.module.fail_json(msg="Import lease not ready: {}".format(error))
+            entity = lease.info.entity
+            self.entity = entity
+
+            duration, disks = self.upload_disks(spec_result, lease)
+        finally:
+            if upload_slot:
+                upload_slot.close()
+
+        if power_on:
+            if isinstance(entity, vim.VirtualApp):
+                wait_for_task(entity.PowerOnVApp_Task())
+            else:
+                wait_for_task(entity.PowerOnVM_Task())
+
+        return {'moId': entity._moId,
+                'bytes': self.bytes_total,
+                'duration': round(duration, 2),
+                'bytes_per_second': int(self.bytes_total / duration),
+                'disks': disks,
+                'slot_wait': slot_wait,
+                'warnings': [w.msg for w in spec_result.warning or []]}
+
+    def upload_disks(self, spec_result, lease):
+        """
+        Streams the disks to the lease urls and completes the lease, returns
+        the upload duration and the per disk figures
+        """
+        session = requests.Session()
+        session.verify = self.module.params['validate_certs']
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1,
+                                                                pool_maxsize=self.max_parallel_uploads))
+        if self.proxy:
+            session.proxies = {'https': self.proxy}
+
+        stop = threading.Event()
+        progress = threading.Thread(target=self.keep_lease, args=(lease, stop))
+        progress.daemon = True
+
+        start = time.time()
+        self.upload_start = start
+        self.bytes_sent = 0
+        try:
+            items = self.upload_items(spec_result, lease)
+            self.bytes_total = sum(self.members[os.path.basename(i.path)][1] for i, _ in items)
+            progress.start()
+
+            pool = ThreadPool(max(min(self.max_parallel_uploads, len(items)), 1))
+            try:
+                disks = pool.map(lambda item: self.upload(session, item), items)
+            finally:
+                pool.close()
+                pool.join()
+
+            lease.HttpNfcLeaseProgress(100)
+            lease.HttpNfcLeaseComplete()
+        except Exception as e:
+            try:
+                lease.HttpNfcLeaseAbort()
+            except Exception:
+                pass
+            self.module.fail_json(msg="Failed to upload OVA disks: {}".format(str(e)))
+        finally:
+            stop.set()
+            session.close()
+
+        return max(time.time() - start, 0.001), disks
+
+    def ova_sha256(self):
+        """
+        Returns a sha256 of the OVA content built from the sha256 of its
+        files, so it comes from the same read as the manifest check
+        """
+        hashes = self.member_hashes()
+        digest = hashlib.sha256()
+        for name in sorted(hashes):
+            digest.update('{}:{}\n'.format(name, hashes[name]['sha256']).encode('utf-8'))
+        return digest.hexdigest()
+
+    def hash_cache_key(self):
+        stat = os.stat(self.ova_file)
+        return '{}:{}:{!r}'.format(os.path.abspath(self.ova_file), stat.st_size, stat.st_mtime)
+
+    def cached_hashes(self):
+        if not self.hash_cache or not os.path.isfile(self.hash_cache):
+            return {}
+        try:
+            with open(self.hash_cache) as f:
+                return json.load(f).get(self.hash_cache_key(), {})
+        except ValueError:
+            return {}
+
+    def save_hashes(self, hashes):
+        """
+        Merge hashes into the cache entry of the OVA, entries of older
+        versions of the same file are dropped
+        """
+        if not self.hash_cache:
+            return
+
+        cache_dir = os.path.dirname(self.hash_cache)
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+
+        key = self.hash_cache_key()
+        path = key.rsplit(':', 2)[0]
+
+        with open(self.hash_cache + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            cache = {}
+            if os.path.isfile(self.hash_cache):
+                try:
+                    with open(self.hash_cache) as f:
+                        cache = json.load(f)
+                except ValueError:
+                    pass
+
+            entry = cache.get(key, {})
+            entry.update(hashes)
+            cache = dict((k, v) for k, v in cache.items() if k.rsplit(':', 2)[0] != path)
+            cache[key] = entry
+
+            fd = os.open(self.hash_cache + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cache, f)
+            os.rename(self.hash_cache + '.tmp', self.hash_cache)
+
+    def hash_member(self, entry):
+        name, algorithms = entry
+        offset, size = self.members[name]
+        digests = [hashlib.new(algorithm) for algorithm in algorithms]
+
+        with open(self.ova_file, 'rb') as f:
+            f.seek(offset)
+            remaining = size
+            while remaining > 0:
+                block = f.read(min(self.hash_block_size, remaining))
+                if not block:
+                    raise IOError("Unexpected end of {}".format(self.ova_file))
+                remaining -= len(block)
+                for digest in digests:
+                    digest.update(block)
+
+        return dict((algorithm, digest.hexdigest()) for algorithm, digest in zip(algorithms, digests))
+
+    def manifest_entries(self):
+        entries = {}
+        for line in (self.manifest or '').splitlines():
+            match = re.match(r'^\s*(\w+)\((.+)\)\s*=\s*([0-9a-fA-F]+)\s*$', line)
+            if match:
+                algorithm, name, digest = match.groups()
+                entries[(algorithm.lower(), os.path.basename(name))] = digest.lower()
+        return entries
+
+    def member_hashes(self):
+        """
+        Returns the sha256, and the digest the manifest lists, of every file
+        in the OVA by name. Each file is read once, straight out of the tar
+        and in parallel with the others. The digests are kept in hash_cache
+        and an unchanged OVA is not read again.
+        """
+        if self.hashes is not None:
+            return self.hashes
+
+        self.read_ova()
+        wanted = dict((name, set(['sha256'])) for name in self.members)
+        for algorithm, name in self.manifest_entries():
+            if name in wanted:
+                wanted[name].add(algorithm)
+
+        cached = self.cached_hashes().get('members', {})
+        hashes = dict((name, dict(cached.get(name, {}))) for name in wanted)
+        todo = [(name, sorted(algorithms)) for name, algorithms in wanted.items()
+                if not algorithms.issubset(hashes[name])]
+        todo.sort(key=lambda e: self.members[e[0]][1], reverse=True)
+
+        if todo:
+            pool = ThreadPool(max(min(self.max_parallel_hashes, len(todo)), 1))
+            try:
+                digests = pool.map(self.hash_member, todo)
+            except (IOError, ValueError) as e:
+                self.module.fail_json(msg="Failed to hash {}: {}".format(self.ova_file, str(e)))
+            finally:
+                pool.close()
+                pool.join()
+
+            for (name, _), member_digests in zip(todo, digests):
+                hashes[name].update(member_digests)
+            self.save_hashes({'members': hashes})
+
+        self.hashes = hashes
+        self.hashes_cached = not todo
+        return hashes
+
+    def verify_manifest(self):
+        """
+        Checks every file listed in the .mf of the OVA against its digest,
+        with the hashes of member_hashes. An OVA without a manifest is not
+        checked, with a warning.
+        Returns a dict with the number of files checked, whether the
+        hashes came from the cache and the duration
+        """
+        start = time.time()
+        self.read_ova()
+
+        if not self.manifest:
+            self.module.warn("No manifest found in {}, skipping the manifest check".format(self.ova_file))
+            return {'files': 0, 'skipped': True, 'duration': round(time.time() - start, 2)}
+
+        expected = self.manifest_entries()
+        missing = [name for _, name in expected if name not in self.members]
+        if missing:
+            self.module.fail_json(msg="Files in manifest missing from {}: {}".format(self.ova_file, ', '.join(missing)))
+
+        hashes = self.member_hashes()
+        mismatched = sorted(name for (algorithm, name), digest in expected.items()
+                            if hashes[name].get(algorithm) != digest)
+        if mismatched:
+            self.module.fail_json(msg="Manifest check failed for {}: {}".format(self.ova_file, ', '.join(mismatched)))
+
+        return {'files': len(expected), 'cached': self.hashes_cached, 'duration': round(time.time() - start, 2)}
+
+    def template_name(self, sha256, deployment_option, disk_mode):
+        return '-'.join(p for p in ['ova', sha256[:16], deployment_option, disk_mode] if p)
+
+    def template_info(self, template):
+        if isinstance(template, vim.VirtualApp):
+            annotation = template.vAppConfig.annotation
+        else:
+            annotation = template.config.annotation
+        try:
+            return json.loads(annotation)
+        except (TypeError, ValueError):
+            return {}
+
+    def save_template(self, template, sha256):
+        annotation = json.dumps({'ova_sha256': sha256, 'networks': self.networks})
+
+        if isinstance(template, vim.VirtualApp):
+            template.UpdateVAppConfig(vim.vApp.VAppConfigSpec(annotation=annotation))
+        else:
+            wait_for_task(template.ReconfigVM_Task(vim.vm.ConfigSpec(annotation=annotation)))
+            template.MarkAsTemplate()
+
+    def clone_networks(self, template_networks, datacenter, networks):
+        """
+        Returns {template portgroup name: new portgroup} or None when two OVF
+        networks the template shares a portgroup for must now be split
+        """
+        portgroups = self.datacenter_networks(datacenter)
+        new_networks = {}
+
+        for ovf_name, template_portgroup in template_networks.items():
+            portgroup_name = networks.get(ovf_name, networks.get('*', template_portgroup))
+            if portgroup_name not in portgroups:
+                self.module.fail_json(msg="Failed to find network {}".format(portgroup_name))
+            if new_networks.get(template_portgroup, portgroups[portgroup_name]) != portgroups[portgroup_name]:
+                return None
+            new_networks[template_portgroup] = portgroups[portgroup_name]
+
+        return new_networks
+
+    def nic_backing(self, network):
+        if isinstance(network, vim.dvs.DistributedVirtualPortgroup):
+            port = vim.dvs.PortConnection(portgroupKey=network.key,
+                                          switchUuid=network.config.distributedVirtualSwitch.uuid)
+            return vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo(port=port)
+        return vim.vm.device.VirtualEthernetCard.NetworkBackingInfo(deviceName=network.name, network=network)
+
+    def nic_network_name(self, nic, datacenter):
+        backing = nic.backing
+        if isinstance(backing, vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo):
+            portgroups = get_all_objs_props(self.content, [vim.dvs.DistributedVirtualPortgroup],
+                                            ['name', 'key'], root=datacenter.networkFolder)
+            for props in portgroups.values():
+                if props['key'] == backing.port.portgroupKey:
+                    return props['name']
+            return None
+        return backing.deviceName
+
+    def clone_vm(self, template, datacenter, cluster, datastore, host, name, new_networks, properties, power_on):
+        device_change = []
+        for device in template.config.hardware.device:
+            if not isinstance(device, vim.vm.device.VirtualEthernetCard):
+                continue
+            network = new_networks.get(self.nic_network_name(device, datacenter))
+            if not network:
+                continue
+            device.backing = self.nic_backing(network)
+            device_change.append(vim.vm.device.VirtualDeviceSpec(operation='edit', device=device))
+
+        property_change = []
+        for prop in template.config.vAppConfig.property:
+            key = '.'.join(p for p in [prop.classId, prop.id, prop.instanceId] if p)
+            if key in properties:
+                info = vim.vApp.PropertyInfo(key=prop.key, value=str(properties[key]))
+                property_change.append(vim.vApp.PropertySpec(operation='edit', info=info))
+
+        config = vim.vm.ConfigSpec(annotation='', deviceChange=device_change,
+                                   vAppConfig=vim.vApp.VmConfigSpec(property=property_change))
+        location = vim.vm.RelocateSpec(datastore=datastore, pool=cluster.resourcePool, host=host)
+        clone_spec = vim.vm.CloneSpec(location=location, config=config, powerOn=power_on, template=False)
+
+        changed, clone = wait_for_task(template.CloneVM_Task(folder=datacenter.vmFolder, name=name, spec=clone_spec))
+        return clone
+
+    def clone_vapp(self, template, datacenter, cluster, datastore, host, name, new_networks, properties, power_on):
+        portgroups = self.datacenter_networks(datacenter)
+        network_mapping = [vim.vApp.CloneSpec.NetworkMappingPair(source=portgroups[old], destination=new)
+                           for old, new in new_networks.items() if old in portgroups]
+
+        clone_spec = vim.vApp.CloneSpec(location=datastore, host=host, vmFolder=datacenter.vmFolder,
+                                        networkMapping=network_mapping,
+                                        property=[vim.KeyValue(key=k, value=str(v)) for k, v in properties.items()])
+
+        changed, clone = wait_for_task(template.CloneVApp_Task(name=name, target=cluster.resourcePool,
+                                                               spec=clone_spec))
+        if power_on:
+            wait_for_task(clone.PowerOnVApp_Task())
+        return clone
+
+    def deploy_cached(self, datacenter_name, cluster_name, datastore_name, name, disk_mode, networks,
+                      properties, deployment_option=None, ip_protocol=None, power_on=True):
+        """
+        Clones name from a template of this OVA, keyed by the OVA sha256,
+        deployment option and disk mode. The template is imported without
+        properties the first time it is needed. Falls back to deploy when
+        the template networks cannot be mapped onto the requested ones.
+        """
+        start = time.time()
+        self.read_ova()
+        sha256 = self.ova_sha256()
+        datacenter, cluster, datastore, host = self.find_targets(datacenter_name, cluster_name, datastore_name)
+        template_name = self.template_name(sha256, deployment_option, disk_mode)
+
+        result = {'ova_sha256': sha256, 'template': template_name}
+
+        template = self.content.searchIndex.FindChild(datacenter.vmFolder, template_name)
+        result['cache_hit'] = template is not None
+
+        if not template:
+            result['import'] = self.deploy(datacenter_name, cluster_name, datastore_name, template_name,
+                                           disk_mode, networks, {}, deployment_option, ip_protocol,
+                                           power_on=False)
+            template = self.entity
+            self.save_template(template, sha256)
+
+        template_info = self.template_info(template)
+        if template_info.get('ova_sha256') != sha256:
+            self.module.fail_json(msg="{} is not a template of {}".format(template_name, self.ova_file))
+
+        new_networks = self.clone_networks(template_info.get('networks', {}), datacenter, networks)
+        if new_networks is None:
+            result['deploy'] = self.deploy(datacenter_name, cluster_name, datastore_name, name, disk_mode,
+                                           networks, properties, deployment_option, ip_protocol, power_on)
+            result.update({'moId': result['deploy']['moId'], 'duration': round(time.time() - start, 2)})
+            return result
+
+        if isinstance(template, vim.VirtualApp):
+            clone = self.clone_vapp(template, datacenter, cluster, datastore, host, name,
+                                    new_networks, properties, power_on)
+        else:
+            clone = self.clone_vm(template, datacenter, cluster, datastore, host, name,
+                                  new_networks, properties, power_on)
+
+        result.update({'moId': clone._moId, 'duration': round(time.time() - start, 2)})
+        return result
@@ -0,0 +1,158 @@
+# Run with: python -m unittest discover -s tests
+
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+import ansible.module_utils
+
+ansible.module_utils.__path__.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                  os.pardir, 'module_utils'))
+
+from ansible.module_utils.vmware_extras import OvaDeployer, OvaMemberStream
+
+
+class PutHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_PUT(self):
+        length = int(self.headers.getheader('Content-Length'))
+        self.received.append((self.path, self.headers.getheader('Content-Type'),
+                              self.rfile.read(length)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class FileItem(object):
+
+    def __init__(self, path, create=True):
+        self.path = path
+        self.create = create
+
+
+class FakeModule(object):
+
+    def __init__(self):
+        self.warnings = []
+
+    def warn(self, warning):
+        self.warnings.append(warning)
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+class OvaUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.disk = os.urandom(3 * 8192 + 123)
+        disk_path = os.path.join(self.tmp, 'disk1.vmdk')
+        with open(disk_path, 'wb') as f:
+            f.write(self.disk)
+        ovf_path = os.path.join(self.tmp, 'appliance.ovf')
+        with open(ovf_path, 'wb') as f:
+            f.write(b'<Envelope/>')
+
+        self.ova = os.path.join(self.tmp, 'appliance.ova')
+        tar = tarfile.open(self.ova, 'w')
+        tar.add(ovf_path, 'appliance.ovf')
+        tar.add(disk_path, 'disk1.vmdk')
+        tar.close()
+
+        PutHandler.received = []
+        self.server = HTTPServer(('127.0.0.1', 0), PutHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp)
+
+    def test_stream_reads_member_in_place(self):
+        tar = tarfile.open(self.ova, 'r:')
+        member = tar.getmember('disk1.vmdk')
+        tar.close()
+        progress = []
+        stream = OvaMemberStream(self.ova, member.offset_data, member.size, 8192, progress.append)
+
+        blocks = []
+        block = stream.read(5000)
+        while block:
+            blocks.append(block)
+            block = stream.read(5000)
+
+        self.assertEqual(len(stream), len(self.disk))
+        self.assertEqual(b''.join(blocks), self.disk)
+        self.assertEqual(sum(progress), len(self.disk))
+        self.assertIsNone(stream.f)
+
+    def add_manifest(self, digest):
+        manifest_path = os.path.join(self.tmp, 'appliance.mf')
+        with open(manifest_path, 'w') as f:
+            f.write('SHA1(disk1.vmdk)= {}\n'.format(digest))
+        tar = tarfile.open(self.ova, 'a')
+        tar.add(manifest_path, 'appliance.mf')
+        tar.close()
+
+    def test_verify_manifest_hashes_each_file_once(self):
+        self.add_manifest(hashlib.sha1(self.disk).hexdigest())
+        cache = os.path.join(self.tmp, 'hashes.json')
+        deployer = OvaDeployer(FakeModule(), None, self.ova, hash_cache=cache)
+
+        result = deployer.verify_manifest()
+        self.assertEqual(result['files'], 1)
+        self.assertFalse(result['cached'])
+        self.assertEqual(deployer.member_hashes()['disk1.vmdk']['sha256'],
+                         hashlib.sha256(self.disk).hexdigest())
+
+        deployer = OvaDeployer(FakeModule(), None, self.ova, hash_cache=cache)
+        deployer.hash_member = None
+        self.assertTrue(deployer.verify_manifest()['cached'])
+        self.assertEqual(len(deployer.ova_sha256()), 64)
+
+    def test_verify_manifest_mismatch_fails(self):
+        self.add_manifest('0' * 40)
+        deployer = OvaDeployer(FakeModule(), None, self.ova)
+        self.assertRaises(AssertionError, deployer.verify_manifest)
+
+    def test_verify_manifest_without_manifest_warns(self):
+        module = FakeModule()
+        deployer = OvaDeployer(module, None, self.ova)
+
+        self.assertTrue(deployer.verify_manifest()['skipped'])
+        self.assertEqual(len(module.warnings), 1)
+
+    def test_upload_sends_disk(self):
+        deployer = OvaDeployer(None, None, self.ova, chunk_size=8192)
+        deployer.read_ova()
+        deployer.bytes_total = len(self.disk)
+        url = 'http://127.0.0.1:{}/nfc/disk-0.vmdk'.format(self.server.server_address[1])
+
+        result = deployer.upload(requests.Session(), (FileItem('disk1.vmdk'), url))
+
+        self.assertEqual(len(PutHandler.received), 1)
+        path, content_type, body = PutHandler.received[0]
+        self.assertEqual(path, '/nfc/disk-0.vmdk')
+        self.assertEqual(content_type, 'application/x-vnd.vmware-streamVmdk')
+        self.assertEqual(body, self.disk)
+        self.assertEqual(result['bytes'], len(self.disk))
+        self.assertEqual(deployer.bytes_sent, len(self.disk))
+
+
+if __name__ == '__main__':
+    unittest.main()
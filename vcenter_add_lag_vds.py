@@ -190,12 +190,12 @@ def check_lag_config(module):
 def check_lag_state(module):
     state = 'absent'
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
     vc['si'] = si
 
     vds_name = module.params['vds_name']
 
-    vds = find_dvs_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     if not vds:
         module.fail_json(msg="Failed to get vds: {}".format(vds_name))
@@ -219,7 +219,6 @@ def check_lag_state(module):
     return state
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -281,6 +280,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
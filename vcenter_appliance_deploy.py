@@ -0,0 +1,394 @@
+#!/usr/bin/python
+#
+# (c) 2015, Joseph Callen <jcallen () csc.com>
+# Portions Copyright (c) 2015 VMware, Inc. All rights reserved.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = '''
+module: vcenter_appliance_deploy
+Short_description: Deploys several appliance ovas to vcenter at the same time
+description:
+    Runs the vcenter_vli_deploy, vcenter_vro_deploy, vcenter_vrops_deploy,
+    vcenter_vsan_witness_deploy and vio_oms_deploy modules for a list of appliances at the
+    same time. With the native deploy method the uploads take turns per datastore and share
+    the network bandwidth, while the power on and api waits of the appliances overlap.
+    Reports the result and timings of every appliance.
+    Run the module on the ansible controller (local_action or delegate_to localhost). The
+    deploy modules run as python scripts reading their arguments from a file, with
+    module_utils prepended to the ansible.module_utils package path.
+requirements:
+    - ansible 2.3 or later installed for the python running the module
+    - the deploy modules in library
+    - vmware_extras.py in module_utils
+Tested on:
+    - vcenter 6.0
+    - pyvmomi 6
+options:
+    hostname:
+        description:
+            - The hostname or IP address of the vSphere vCenter API server
+        required: True
+    username:
+        description:
+            - The username of the vSphere vCenter with Admin rights
+        required: True
+        aliases: ['user', 'admin']
+    password:
+        description:
+            - The password of the vSphere vCenter user
+        required: True
+        aliases: ['pass', 'pwd']
+    appliances:
+        description:
+            - List of appliances, each a dict with module (one of the deploy modules), an
+              optional name and params, the module parameters without the vCenter
+              connection parameters
+        required: True
+    library:
+        description:
+            - Directory holding the deploy modules, defaults to ANSIBLE_LIBRARY
+    module_utils:
+        description:
+            - Directory holding vmware_extras.py, defaults to ANSIBLE_MODULE_UTILS, then the
+              module_utils directory of library
+    deploy_method:
+        description:
+            - deploy_method of the appliances that do not set their own, the default of
+              each deploy module (ovftool) when not set. vio_oms_deploy always uses ovftool,
+              the native method cannot bind the vService dependency of the OMS vApp
+        choices: ['ovftool', 'native']
+    max_parallel_deploys:
+        description:
+            - Number of appliances deployed at the same time
+        default: 5
+    datastore_parallel_uploads:
+        description:
+            - Number of appliances uploading to the same datastore at once
+        default: 2
+    network_bandwidth:
+        description:
+            - MB/s shared by the uploads running at the same time, 0 for no limit
+        default: 0
+    upload_slot_dir:
+        description:
+            - Directory of the lock files the deploys use to take turns uploading
+        default: ~/.ansible/ova_upload_slots
+'''
+
+EXAMPLE = '''
+- name: Deploy vRealize and VIO appliances
+  local_action:
+    module: vcenter_appliance_deploy
+    hostname: "{{ vcenter }}"
+    username: "{{ vcenter_user }}"
+    password: "{{ vcenter_password }}"
+    validate_certs: "{{ vcenter_validate_certs }}"
+    library: "{{ playbook_dir }}/library"
+    deploy_method: native
+    network_bandwidth: 100
+    appliances:
+      - module: vcenter_vli_deploy
+        params:
+          vmname: "{{ vli_vmname }}"
+          path_to_ova: "{{ ova_path }}"
+          ova_file: "{{ vrli_ova }}"
+          datacenter: "{{ datacenter.name }}"
+          cluster: "{{ ib_vcenter_mgmt_esx_cluster_name }}"
+          datastore: "{{ ib_vcenter_mgmt_esx_cluster_name }}_VSAN_DS"
+          vli_hostname: "{{ vrli_hostname }}"
+          network: "{{ mgmt_vds_viomgmt }}"
+          gateway: "{{ vrli_gateway }}"
+          dns_ip: "{{ ova_dns_list }}"
+          ip_addr: "{{ vrli_ip_addr }}"
+          netmask: "{{ vrli_netmask }}"
+          root_password: "{{ vrli_rootpw }}"
+          deployment_size: "{{ vli_deployment_size }}"
+      - module: vcenter_vro_deploy
+        params:
+          vmname: "{{ vro_vmname }}"
+          path_to_ova: "{{ ova_path }}"
+          ova_file: "{{ vro_ova }}"
+          datacenter: "{{ datacenter.name }}"
+          cluster: "{{ ib_vcenter_mgmt_esx_cluster_name }}"
+          datastore: "{{ ib_vcenter_mgmt_esx_cluster_name }}_VSAN_DS"
+          network: "{{ mgmt_vds_viomgmt }}"
+          vro_root_pass: "{{ vro_root_pass }}"
+          enable_ssh: True
+          vro_hostname: "{{ vro_hostname }}"
+          vro_gateway: "{{ vro_gateway }}"
+          vro_domain: "{{ vro_domain }}"
+          vro_dns_ip: "{{ ova_dns_list }}"
+          vro_ip_address: "{{ vro_ip_address }}"
+          vro_netmask: "{{ vro_netmask }}"
+  tags:
+    - deploy_appliances
+'''
+
+RETURN = '''
+appliances:
+  description: per appliance name, module, changed, failed, msg, start and duration in seconds
+               from the start of the run, timings of the manifest check, upload slot wait,
+               upload, vm and api readiness and the module result, without the passwords
+               and the module invocation
+  type: list
+duration:
+  description: seconds the whole run took
+  type: float
+'''
+
+try:
+    import json
+    import os
+    import re
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+    import time
+    from multiprocessing.pool import ThreadPool
+    IMPORTS = True
+except ImportError:
+    IMPORTS = False
+
+
+DEPLOY_MODULES = ['vcenter_vli_deploy', 'vcenter_vro_deploy', 'vcenter_vrops_deploy',
+                  'vcenter_vsan_witness_deploy', 'vio_oms_deploy']
+
+# vio_oms_deploy needs ovftool to bind the vService dependency of its vApp
+NATIVE_DEPLOY_MODULES = ['vcenter_vli_deploy', 'vcenter_vro_deploy', 'vcenter_vrops_deploy',
+                         'vcenter_vsan_witness_deploy']
+
+MIN_ANSIBLE_VERSION = (2, 3)
+
+BOOTSTRAP = ("import runpy, sys; import ansible.module_utils; "
+             "ansible.module_utils.__path__[:0] = sys.argv[3:]; sys.argv = sys.argv[1:3]; "
+             "runpy.run_path(sys.argv[0], run_name='__main__')")
+
+SECRET_PARAMS = ['password', 'root_password', 'vro_root_pass', 'viouser_password']
+
+
+def scrub_secrets(value, secrets):
+    """
+    Returns value without the SECRET_PARAMS keys and the invocation of the
+    module, and with every secret in secrets masked in the strings left
+    """
+    if isinstance(value, dict):
+        return dict((k, scrub_secrets(v, secrets)) for k, v in value.items()
+                    if k not in SECRET_PARAMS and k != 'invocation')
+    if isinstance(value, list):
+        return [scrub_secrets(v, secrets) for v in value]
+    if isinstance(value, basestring):
+        for secret in secrets:
+            value = value.replace(secret, '********')
+    return value
+
+
+class ApplianceDeploy(object):
+    """
+    Runs the deploy module of every appliance in its own process,
+    max_parallel_deploys at a time
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.appliances = module.params['appliances']
+        self.library = module.params['library'] or os.environ.get('ANSIBLE_LIBRARY', '')
+        self.module_utils = module.params['module_utils'] or os.environ.get('ANSIBLE_MODULE_UTILS') or \
+            os.pathsep.join(os.path.join(d, 'module_utils') for d in self.library.split(os.pathsep) if d)
+        self.max_parallel_deploys = max(min(module.params['max_parallel_deploys'], len(self.appliances)), 1)
+        self.start = None
+
+    def module_path(self, name):
+        for directory in self.library.split(os.pathsep):
+            path = os.path.join(os.path.expanduser(directory), name + '.py')
+            if directory and os.path.isfile(path):
+                return path
+        return None
+
+    def module_utils_dirs(self):
+        return [os.path.expanduser(d) for d in self.module_utils.split(os.pathsep)
+                if d and os.path.isfile(os.path.join(os.path.expanduser(d), 'vmware_extras.py'))]
+
+    def check_ansible_version(self):
+        try:
+            proc = subprocess.Popen([sys.executable, '-c', 'import ansible; print(ansible.__version__)'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            out, err = proc.communicate()
+        except OSError as e:
+            self.module.fail_json(msg="Failed to run {}: {}".format(sys.executable, str(e)))
+
+        match = re.match(r'(\d+)\.(\d+)', out.strip())
+        if proc.returncode != 0 or not match:
+            self.module.fail_json(msg="Failed to find the ansible version of {}: {}".format(sys.executable,
+                                                                                         err.strip()))
+        if tuple(int(v) for v in match.groups()) < MIN_ANSIBLE_VERSION:
+            self.module.fail_json(msg="The deploy modules need ansible {} or later, {} has {}".format(
+                '.'.join(str(v) for v in MIN_ANSIBLE_VERSION), sys.executable, out.strip()))
+
+    def check_appliances(self):
+        self.check_ansible_version()
+
+        if not self.module_utils_dirs():
+            self.module.fail_json(msg="Failed to find vmware_extras.py in module_utils {}".format(
+                self.module_utils))
+
+        for appliance in self.appliances:
+            if appliance.get('module') not in DEPLOY_MODULES:
+                self.module.fail_json(msg="module must be one of {}: {}".format(', '.join(DEPLOY_MODULES),
+                                                                              appliance.get('module')))
+            if not self.module_path(appliance['module']):
+                self.module.fail_json(msg="Failed to find {} in library {}".format(appliance['module'],
+                                                                                  self.library))
+            params = appliance.get('params') or {}
+            if params.get('deploy_method') == 'native' and appliance['module'] not in NATIVE_DEPLOY_MODULES:
+                self.module.fail_json(msg="{} does not support deploy_method native".format(appliance['module']))
+
+    def appliance_params(self, appliance):
+        params = dict(appliance.get('params') or {})
+
+        for key in ['hostname', 'username', 'password', 'validate_certs']:
+            params.setdefault(key, self.module.params[key])
+
+        if appliance['module'] not in NATIVE_DEPLOY_MODULES:
+            return params
+
+        if self.module.params['deploy_method']:
+            params.setdefault('deploy_method', self.module.params['deploy_method'])
+        params.setdefault('upload_slot_dir', self.module.params['upload_slot_dir'])
+        params.setdefault('upload_slots', self.module.params['datastore_parallel_uploads'])
+
+        if self.module.params['network_bandwidth']:
+            rate_limit = max(self.module.params['network_bandwidth'] // self.max_parallel_deploys, 1)
+            params.setdefault('upload_rate_limit', rate_limit)
+
+        return params
+
+    def module_result(self, out):
+        for line in reversed(out.splitlines()):
+            line = line.strip()
+            if not line.startswith('{'):
+                continue
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue
+        return {}
+
+    def timings(self, result):
+        values = dict(result)
+        if isinstance(result.get('result'), dict):
+            values.update(result['result'])
+
+        deploy = values.get('deploy') or values
+        manifest = values.get('manifest') or {}
+
+        return {'manifest': manifest.get('duration'),
+                'slot_wait': deploy.get('slot_wait'),
+                'deploy': deploy.get('duration'),
+                'bytes_per_second': deploy.get('bytes_per_second'),
+                'vm_ready': (values.get('vm_ready') or {}).get('ready_after'),
+                'api_ready': (values.get('api_probe') or {}).get('ready_after')}
+
+    def run_appliance(self, appliance):
+        params = self.appliance_params(appliance)
+        name = appliance.get('name') or params.get('vmname')
+
+        args_dir = tempfile.mkdtemp()
+        args_file = os.path.join(args_dir, 'args')
+        fd = os.open(args_file, os.O_WRONLY | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'ANSIBLE_MODULE_ARGS': params}, f)
+
+        start = time.time()
+        try:
+            command = [sys.executable, '-c', BOOTSTRAP, self.module_path(appliance['module']), args_file]
+            proc = subprocess.Popen(command + self.module_utils_dirs(),
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            out, err = proc.communicate()
+        finally:
+            shutil.rmtree(args_dir)
+
+        secrets = [str(params[k]) for k in SECRET_PARAMS if params.get(k)]
+        result = scrub_secrets(self.module_result(out), secrets)
+        failed = proc.returncode != 0 or result.get('failed', False) or not result
+
+        appliance_result = {'name': name,
+                            'module': appliance['module'],
+                            'changed': result.get('changed', False),
+                            'failed': failed,
+                            'msg': result.get('msg'),
+                            'start': round(start - self.start, 2),
+                            'duration': round(time.time() - start, 2),
+                            'timings': self.timings(result),
+                            'result': result}
+        if failed and not result:
+            appliance_result['stderr'] = scrub_secrets(err, secrets)
+
+        return appliance_result
+
+    def deploy_all(self):
+        self.check_appliances()
+        self.start = time.time()
+
+        pool = ThreadPool(self.max_parallel_deploys)
+        try:
+            results = pool.map(self.run_appliance, self.appliances)
+        finally:
+            pool.close()
+            pool.join()
+
+        duration = round(time.time() - self.start, 2)
+        changed = any(r['changed'] for r in results)
+        failed = [r['name'] for r in results if r['failed']]
+
+        if failed:
+            self.module.fail_json(msg="Failed to deploy: {}".format(', '.join(failed)),
+                                  changed=changed, appliances=results, duration=duration)
+
+        self.module.exit_json(changed=changed, appliances=results, duration=duration)
+
+
+def main():
+    argument_spec = vmware_argument_spec()
+
+    argument_spec.update(
+        dict(
+            appliances=dict(required=True, type='list', no_log=True),
+            library=dict(required=False, type='str'),
+            module_utils=dict(required=False, type='str'),
+            deploy_method=dict(required=False, choices=['ovftool', 'native']),
+            max_parallel_deploys=dict(default=5, type='int'),
+            datastore_parallel_uploads=dict(default=2, type='int'),
+            network_bandwidth=dict(default=0, type='int'),
+            upload_slot_dir=dict(default='~/.ansible/ova_upload_slots', type='str'),
+        )
+    )
+
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+
+    if not IMPORTS:
+        module.fail_json(msg="Failed to import modules")
+
+    appliance_deploy = ApplianceDeploy(module)
+    appliance_deploy.deploy_all()
+
+
+from ansible.module_utils.basic import *
+from ansible.module_utils.vmware import *
+
+if __name__ == '__main__':
+    main()
@@ -253,10 +253,10 @@ def check_spec_vsan(si, module):
 def check_spec_drs(si, module):
 
     datacenter_name = module.params['datacenter_name']
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     cluster_name = module.params['cluster_name']
-    cluster = find_cluster_by_name_datacenter(datacenter, cluster_name)
+    cluster = find_vcenter_object_by_name(si, vim.ClusterComputeResource, cluster_name, datacenter.hostFolder)
 
     drs_info = module.params['drs']
     desired_drs_spec = configure_drs(module, module.params['drs']['enabled'])
@@ -274,10 +274,10 @@ def check_spec_drs(si, module):
 def check_spec_ha(si, module):
 
     datacenter_name = module.params['datacenter_name']
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     cluster_name = module.params['cluster_name']
-    cluster = find_cluster_by_name_datacenter(datacenter, cluster_name)
+    cluster = find_vcenter_object_by_name(si, vim.ClusterComputeResource, cluster_name, datacenter.hostFolder)
 
     ha_info = module.params['ha']
     desired_ha_spec = configure_ha(module, True)
@@ -301,7 +301,7 @@ def state_create_cluster(si, module):
     cluster_name = module.params['cluster_name']
 
     datacenter_name = module.params['datacenter_name']
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     try:
         cluster_config_spec = vim.cluster.ConfigSpecEx()
@@ -333,10 +333,10 @@ def state_create_cluster(si, module):
 def state_destroy_cluster(si, module):
 
     datacenter_name = module.params['datacenter_name']
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     cluster_name = module.params['cluster_name']
-    cluster = find_cluster_by_name_datacenter(datacenter, cluster_name)
+    cluster = find_vcenter_object_by_name(si, vim.ClusterComputeResource, cluster_name, datacenter.hostFolder)
 
     changed = True
     result = None
@@ -361,10 +361,10 @@ def state_exit_unchanged(si, module):
 def state_update_cluster(si, module):
 
     datacenter_name = module.params['datacenter_name']
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     cluster_name = module.params['cluster_name']
-    cluster = find_cluster_by_name_datacenter(datacenter, cluster_name)
+    cluster = find_vcenter_object_by_name(si, vim.ClusterComputeResource, cluster_name, datacenter.hostFolder)
 
     cluster_config_spec = vim.cluster.ConfigSpecEx()
 
@@ -403,12 +403,13 @@ def check_cluster_configuration(si, module):
     state = 'absent'
 
     try:
-        datacenter = find_datacenter_by_name(si, datacenter_name)
+        datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
         if not datacenter:
             module.fail_json(msg="Datacenter {} does not exist".format(datacenter_name))
 
-        cluster = find_cluster_by_name_datacenter(datacenter, cluster_name)
+        cluster = find_vcenter_object_by_name(si, vim.ClusterComputeResource, cluster_name,
+                                              datacenter.hostFolder)
 
         if cluster:
 
@@ -466,7 +467,7 @@ def main():
         }
     }
 
-    context = connect_to_api(module)
+    context = connect_to_api_cached(module)
 
     desired_state = module.params['state']
     current_state = check_cluster_configuration(context, module)
@@ -475,6 +476,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
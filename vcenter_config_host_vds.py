@@ -19,7 +19,6 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
 
-
 DOCUMENTATION = '''
 module: vcenter_config_host_vds
 short_description: Configure hosts vmnic on specified uplink port
@@ -464,15 +463,15 @@ def check_vds_host_state(module):
     vds_name = module.params['vds_name']
     esxi_hostname = module.params['esxi_hostname']
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
     vc['si'] = si
 
-    datacenter = find_datacenter_by_name(si, datacenter_name)
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, datacenter_name)
 
     if not datacenter:
         module.fail_json(msg="Could not find Datacenter: {}".format(datacenter_name))
 
-    vds = find_dvs_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     if not vds:
         module.fail_json(msg="Virtual distributed switch: {} does not exist".format(vds_name))
@@ -497,7 +496,7 @@ def check_vds_host_state(module):
     host = find_host_attached_vds(esxi_hostname, vds)
 
     if not host:
-        host = find_hostsystem_by_name(si, esxi_hostname)
+        host = find_vcenter_object_by_name(si, vim.HostSystem, esxi_hostname)
 
         if not host:
             module.fail_json(msg="Esxi host: %s not in vcenter" % esxi_hostname)
@@ -525,7 +524,6 @@ def check_vds_host_state(module):
             return 'update'
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -571,6 +569,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
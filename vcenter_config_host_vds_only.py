@@ -19,7 +19,6 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
 
-
 DOCUMENTATION = '''
 module: vcenter_addhostdvs_assignuplink
 short_description: Adds host to distributed switch and maintains physical connection
@@ -104,6 +103,13 @@ try:
 except ImportError:
     HAS_PYVMOMI = False
 
+
+# One login per module run: the ServiceContent and the resolved datacenter,
+# vds, uplink portgroup and host are stored here by check_vds_host_state
+# and shared by all helpers.
+vc = {}
+
+
 def connect_to_vcenter(module, disconnect_atexit=True):
     hostname = module.params['vcenter_hostname']
     username = module.params['login']
@@ -125,39 +131,6 @@ def connect_to_vcenter(module, disconnect_atexit=True):
         module.fail_json(msg="Unable to connect to vCenter or ESXi API on TCP/443.", apierror=str(connection_error))
 
 
-def wait_for_task(task):
-    while True:
-        if task.info.state == vim.TaskInfo.State.success:
-            return True, task.info.result
-        if task.info.state == vim.TaskInfo.State.error:
-            try:
-                raise Exception(task.info.error)
-            except AttributeError:
-                raise Exception("An unknown error has occurred")
-        if task.info.state == vim.TaskInfo.State.running:
-            time.sleep(15)
-        if task.info.state == vim.TaskInfo.State.queued:
-            time.sleep(15)
-
-
-def get_all_objects(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    return obj
-
-
-def find_vcenter_object_by_name(content, vimtype, object_name):
-    vcenter_object = get_all_objects(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
-
 def find_dvs_uplink_pg(vds):
     if len(vds.config.uplinkPortgroup):
         return vds.config.uplinkPortgroup[0]
@@ -184,35 +157,21 @@ def check_uplinks(module, vds, host, vmnics):
     return collections.Counter(pnic_devices) == collections.Counter(vmnics)
 
 def find_dvs_by_name(content, vds_name):
-    vdSwitches = get_all_objects(content, [vim.dvs.VmwareDistributedVirtualSwitch])
-    for vds in vdSwitches:
-        if vds_name == vds.name:
+    vdSwitches = get_all_objs_props(content, [vim.dvs.VmwareDistributedVirtualSwitch])
+    for vds, vds_props in vdSwitches.items():
+        if vds_name == vds_props['name']:
             return vds
     return None
 
-def find_dvs_uplink_pg(module):
-        # There should only always be a single uplink port group on
-        # a distributed virtual switch
-    content = connect_to_vcenter(module)
-    vds_name = module.params['vds_name']
-    dv_switch = find_dvs_by_name(content, vds_name)
-    if len(dv_switch.config.uplinkPortgroup):
-        return dv_switch.config.uplinkPortgroup[0]
-    else:
-        return None
-
 def modify_dvs_host(module, operation):
-    content = connect_to_vcenter(module)
-    vds_name = module.params['vds_name']
-    esxi_hostname = module.params['esxi_hostname']
     vmnics = module.params['vmnics']
-    uplink_portgroup = find_dvs_uplink_pg(module)
-    dv_switch = find_dvs_by_name(content, vds_name)
+    uplink_portgroup = vc['uplink_portgroup']
+    dv_switch = vc['vds']
     spec = vim.DistributedVirtualSwitch.ConfigSpec()
     spec.configVersion = dv_switch.config.configVersion
     spec.host = [vim.dvs.HostMember.ConfigSpec()]
     spec.host[0].operation = operation
-    spec.host[0].host = find_hostsystem_by_name(content, esxi_hostname)
+    spec.host[0].host = vc['host']
     if operation in ("edit", "add"):
         spec.host[0].backing = vim.dvs.HostMember.PnicBacking()
         count = 0
@@ -223,33 +182,28 @@ def modify_dvs_host(module, operation):
             count += 1
 
     task = dv_switch.ReconfigureDvs_Task(spec)
-    changed, result = wait_for_task(task)
+    changed, result = wait_for_task_updates(task)
     return changed, result
     
 def host_compatibility_check(module):
     try:
-        content = connect_to_vcenter(module)
-        vds_name = module.params['vds_name']
-        dv_switch = find_dvs_by_name(content, vds_name)
-        vds_manager = module.params['content'].dvSwitchManager
+        vds_manager = vc['content'].dvSwitchManager
         compatible_hosts = vds_manager.QueryCompatibleHostForExistingDvs(
-            module.params['datacenter'],
+            vc['datacenter'],
             True,
-            dv_switch,
+            vc['vds'],
         )
     except Exception as e:
         module.fail_json(msg="Could not determine host compatibility: %s" % str(e))
 
-    if module.params['host'] in compatible_hosts:
+    if vc['host'] in compatible_hosts:
         return True
     else:
         return False
 
 
 def host_migration_allowed(module):
-    content = connect_to_vcenter(module)
-    esxi_hostname = module.params['esxi_hostname']
-    host = find_hostsystem_by_name(content, esxi_hostname)
+    host = vc['host']
     iscsi_manager = host.configManager.iscsiManager
 
     try:
@@ -268,16 +222,16 @@ def find_hostsystem_by_name(content, host_name):
         return None
 
 def vds_uuid(module):
-    vds_switch = module.params['vds']
+    vds_switch = vc['vds']
 
     if isinstance(vds_switch, vim.DistributedVirtualSwitch):
-        module.params['vds_uuid'] = vds_switch.uuid
+        vc['vds_uuid'] = vds_switch.uuid
     else:
         module.fail_json(msg="Failed to get vds uuid")
 
 
 def get_portgroup_key(module, portgroup_name):
-    content = module.params['content']
+    content = vc['content']
 
     portgroup = find_vcenter_object_by_name(
         content,
@@ -292,20 +246,18 @@ def get_portgroup_key(module, portgroup_name):
 
 
 def host_vswitch_spec_values(module):
-    content = connect_to_vcenter(module)
-    esxi_hostname = module.params['esxi_hostname']
-    host = find_hostsystem_by_name(content, esxi_hostname)
+    host = vc['host']
     host_networkSystemConfig = host.configManager.networkSystem.networkConfig
     host_vswitch_name = [s.name for s in host_networkSystemConfig.vswitch][0]
     host_vswitch_numports = [n.spec.numPorts for n in host_networkSystemConfig.vswitch][0]
 
-    module.params['host_vswitch_name'] = host_vswitch_name
-    module.params['host_vswitch_numports'] = host_vswitch_numports
+    vc['host_vswitch_name'] = host_vswitch_name
+    vc['host_vswitch_numports'] = host_vswitch_numports
 
 
 def host_vswitch_spec(module, change_operation):
-    vswitch_numports = module.params['host_vswitch_numports']
-    vswitch_name = module.params['host_vswitch_name']
+    vswitch_numports = vc['host_vswitch_numports']
+    vswitch_name = vc['host_vswitch_name']
 
     try:
         policy_shaping = vim.host.NetworkPolicy.TrafficShapingPolicy(enabled=False)
@@ -365,8 +317,8 @@ def host_vswitch_spec(module, change_operation):
 
 
 def host_proxyswitch_spec(module, change_operation, pnic_device):
-    uplink_key = module.params['uplink_portgroup_key']
-    vdsuuid = module.params['vds_uuid']
+    uplink_key = vc['uplink_portgroup_key']
+    vdsuuid = vc['vds_uuid']
 
     try:
         host_pnic_spec = vim.dvs.HostMember.PnicSpec(
@@ -413,7 +365,7 @@ def host_portgroup_spec(module, change_operation, portgroup_name):
 
 
 def host_vnic_spec(module, portgroup_key, change_operation, vmknic):
-    vdsuuid = module.params['vds_uuid']
+    vdsuuid = vc['vds_uuid']
 
     try:
         vds_port_config = vim.dvs.PortConnection(
@@ -439,8 +391,8 @@ def host_vnic_spec(module, portgroup_key, change_operation, vmknic):
 
 
 def vds_reconfigure_spec(module, change_operation):
-    vds_tmp = module.params['vds']
-    host_tmp = module.params['host']
+    vds_tmp = vc['vds']
+    host_tmp = vc['host']
 
     try:
         vds_spec = vim.DistributedVirtualSwitch.ConfigSpec()
@@ -482,9 +434,7 @@ def build_portgroup_spec(module):
 
 def get_management_vmk(module):
 
-    content = connect_to_vcenter(module)
-    esxi_hostname = module.params['esxi_hostname']
-    host = find_hostsystem_by_name(content, esxi_hostname)
+    host = vc['host']
 
     try:
         net_config= host.configManager.virtualNicManager.QueryNetConfig("management")
@@ -531,9 +481,7 @@ def build_hostnetworkconfig(module):
 
 
 def host_remove_vswitch(module):
-    content = connect_to_vcenter(module)
-    esxi_hostname = module.params['esxi_hostname']
-    host = find_hostsystem_by_name(content, esxi_hostname)
+    host = vc['host']
     host_networkSystem = host.configManager.networkSystem
     vswitch = host_networkSystem.networkInfo.vswitch[0].name
 
@@ -553,7 +501,7 @@ def host_remove_vswitch(module):
 def reconfigure_vds_task(module, vds, reconfig_spec):
     try:
         reconfigure_task = vds.ReconfigureDvs_Task(reconfig_spec)
-        changed, result = wait_for_task(reconfigure_task)
+        changed, result = wait_for_task_updates(reconfigure_task)
     except Exception as e:
         module.fail_json(msg="Failed to reconfigure vds with host: %s" % str(e))
 
@@ -579,8 +527,8 @@ def state_exit_unchanged(module):
 
 def state_create_vds_host(module):
     vds_task_operation = "add"
-    vds = module.params['vds']
-    host = module.params['host']
+    vds = vc['vds']
+    host = vc['host']
 
     compatible = host_compatibility_check(module)
     migration_allowed = host_migration_allowed(module)
@@ -615,7 +563,7 @@ def check_vds_host_state(module):
     vmnics = module.params['vmnics']
 
     content = connect_to_vcenter(module)
-    module.params['content'] = content
+    vc['content'] = content
     datacenter = find_vcenter_object_by_name(content, vim.Datacenter, datacenter_name)
 
     if datacenter is None:
@@ -626,26 +574,26 @@ def check_vds_host_state(module):
     if vds is None:
         module.fail_json(msg="Virtual distributed switch: %s does not exist" % vds_name)
 
-    uplink_portgroup = find_dvs_uplink_pg(module)
+    uplink_portgroup = find_dvs_uplink_pg(vds)
 
     if uplink_portgroup is None:
         module.fail_json(msg="An uplink portgroup does not exist on the distributed virtual switch %s" % vds_name)
     
-    module.params['datacenter'] = datacenter
-    module.params['vds'] = vds
-    module.params['vds_uuid'] = vds.uuid
-    module.params['uplink_portgroup'] = uplink_portgroup
-    module.params['uplink_portgroup_key'] = uplink_portgroup.key
+    vc['datacenter'] = datacenter
+    vc['vds'] = vds
+    vc['vds_uuid'] = vds.uuid
+    vc['uplink_portgroup'] = uplink_portgroup
+    vc['uplink_portgroup_key'] = uplink_portgroup.key
     
     host = find_host_attached_vds(esxi_hostname, vds)
     if host is None:
         host = find_vcenter_object_by_name(content, vim.HostSystem, esxi_hostname)
         if host is None:
             module.fail_json(msg="Esxi host: %s not in vcenter" % esxi_hostname)
-        module.params['host'] = host
+        vc['host'] = host
         return 'absent'
     else:
-        module.params['host'] = host
+        vc['host'] = host
         if check_uplinks(module, vds, host, vmnics):
             return 'present'
         else:
@@ -694,6 +642,7 @@ def main():
 
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
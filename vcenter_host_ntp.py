@@ -57,6 +57,11 @@ options:
         description:
             - The ip or fqdn for the NTP server
         required: True
+    max_parallel_hosts:
+        description:
+            - The maximum number of hosts checked or configured at the same time
+        type: int
+        default: 8
     state:
         description:
             - Desired state of the disk group
@@ -83,10 +88,11 @@ host_results:
   description: List of dicts for hosts changed
   returned: host_results
   type: list
-  sample: "{'name': str, 'host_ntp_server_changed': bool, 'restart_ntp': bool}"
+  sample: "{'name': str, 'host_ntp_server_changed': bool, 'restart_ntp': bool, 'duration': float}"
 '''
 
 try:
+    import time
     from pyVmomi import vim, vmodl
     IMPORTS = True
 except ImportError:
@@ -101,9 +107,11 @@ class VcenterHostNtp(object):
         self.cluster_name = module.params['cluster_name']
         self.ntp_server = module.params['ntp_server']
         self.desired_state = module.params['state']
+        self.max_parallel_hosts = max(1, module.params['max_parallel_hosts'])
         self.hosts = None
+        self.host_props = {}
         self.host_update_list = []
-        self.content = connect_to_api(module)
+        self.content = connect_to_api_cached(module)
 
     def run_state(self):
 
@@ -181,25 +189,30 @@ class VcenterHostNtp(object):
 
         return changed
 
-    def state_create(self):
-        changed = False
-        results = []
+    def create_host(self, host):
+        start = time.time()
+        host_results = {'name': host.name}
+        restart_ntp = False
 
-        for host in self.host_update_list:
-            host_results = {'name': host.name}
+        if not self.check_host_ntp_server(host):
+            host_ntp_server_changed = self.update_host_date_time(host)
+            restart_ntp = self.set_ntp_service(host, 'restart')
 
-            if not self.check_host_ntp_server(host):
-                host_ntp_server_changed = self.update_host_date_time(host)
-                restart_ntp = self.set_ntp_service(host, 'restart')
+            host_results.update({'host_ntp_server_changed': host_ntp_server_changed})
+            host_results.update({'restart_ntp': restart_ntp})
 
-                host_results.update({'host_ntp_server_changed': host_ntp_server_changed})
-                host_results.update({'restart_ntp': restart_ntp})
+        # host_props predates the restart, ntpd is running after a successful one
+        if not restart_ntp and not self.check_host_ntp_service(host):
+            host_ntp_service_changed = self.set_ntp_service(host, 'start')
+            host_results.update({'host_ntp_service_changed': host_ntp_service_changed})
 
-            if not self.check_host_ntp_service(host):
-                host_ntp_service_changed = self.set_ntp_service(host, 'start')
-                host_results.update({'host_ntp_service_changed': host_ntp_service_changed})
+        host_results.update({'duration': round(time.time() - start, 2)})
 
-            results.append(host_results)
+        return host_results
+
+    def state_create(self):
+        changed = False
+        results = run_on_hosts(self.host_update_list, self.create_host, self.max_parallel_hosts)
 
         if results:
             changed = True
@@ -212,26 +225,67 @@ class VcenterHostNtp(object):
     def state_exit_unchanged(self):
         self.module.exit_json(changed=False, msg="EXIT UNCHANGED")
 
+    def delete_host(self, host):
+        start = time.time()
+        stop_ntp_service = self.set_ntp_service(host, 'stop')
+        remove_ntp_server = self.update_host_date_time(host)
+        host_results = {'name': host.name,
+                        'stop_ntp_service': stop_ntp_service,
+                        'remove_ntp_server': remove_ntp_server,
+                        'duration': round(time.time() - start, 2)}
+
+        return host_results
+
     def state_delete(self):
         changed = False
-        results = []
-
-        for host in self.host_update_list:
-            stop_ntp_service = self.set_ntp_service(host, 'stop')
-            remove_ntp_server = self.update_host_date_time(host)
-            host_results = {'name': host.name,
-                            'stop_ntp_service': stop_ntp_service,
-                            'remove_ntp_server': remove_ntp_server}
-            results.append(host_results)
+        results = run_on_hosts(self.host_update_list, self.delete_host, self.max_parallel_hosts)
 
         if results:
             changed = True
 
         self.module.exit_json(changed=changed, results=results, msg="STATE DELETE")
 
+    def cluster_host_properties(self, cluster):
+        '''
+        Reads the ntp servers and services of every host in the cluster
+        with one PropertyCollector traversal of cluster.host
+        :return: dict, {host._moId: {property_path: value}}
+        '''
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseClusterHosts',
+            path='host',
+            skip=False,
+            type=vim.ComputeResource
+        )
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=cluster,
+            skip=True,
+            selectSet=[traversal_spec]
+        )
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.HostSystem,
+            pathSet=['config.dateTimeInfo.ntpConfig.server', 'config.service.service'],
+            all=False
+        )
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec],
+            propSet=[property_spec]
+        )
+
+        host_props = {}
+
+        for object_content in self.content.propertyCollector.RetrieveContents([filter_spec]):
+            host_props[object_content.obj._moId] = dict((p.name, p.val) for p in object_content.propSet)
+
+        return host_props
+
     def check_host_ntp_service(self, host):
         ntp_status = False
-        host_services = host.configManager.serviceSystem.serviceInfo.service
+
+        if host._moId in self.host_props:
+            host_services = self.host_props[host._moId].get('config.service.service') or []
+        else:
+            host_services = host.configManager.serviceSystem.serviceInfo.service
 
         try:
             ntp_status = [s.running for s in host_services if s.key == 'ntpd'][0]
@@ -242,8 +296,12 @@ class VcenterHostNtp(object):
 
     def check_host_ntp_server(self, host):
         state = False
-        date_time_system = host.configManager.dateTimeSystem
-        host_ntp_servers = date_time_system.dateTimeInfo.ntpConfig.server
+
+        if host._moId in self.host_props:
+            host_ntp_servers = self.host_props[host._moId].get('config.dateTimeInfo.ntpConfig.server') or []
+        else:
+            date_time_system = host.configManager.dateTimeSystem
+            host_ntp_servers = date_time_system.dateTimeInfo.ntpConfig.server
 
         if self.ntp_server in host_ntp_servers:
             state = True
@@ -253,7 +311,7 @@ class VcenterHostNtp(object):
     def current_state(self):
         state = 'absent'
 
-        cluster = find_cluster_by_name(self.content, self.cluster_name)
+        cluster = find_vcenter_object_by_name(self.content, vim.ClusterComputeResource, self.cluster_name)
 
         if not cluster:
             msg = "Cannot find cluster: {}".format(self.cluster_name)
@@ -266,6 +324,7 @@ class VcenterHostNtp(object):
             self.module.exit_json(changed=False, msg=msg)
 
         self.hosts = hosts
+        self.host_props = self.cluster_host_properties(cluster)
 
         for host in self.hosts:
 
@@ -298,6 +357,7 @@ def main():
         dict(
             cluster_name=dict(required=True, type='str'),
             ntp_server=dict(required=True, type='str'),
+            max_parallel_hosts=dict(default=8, type='int'),
             state=dict(default='present', choices=['present', 'absent'], type='str'),
         )
     )
@@ -312,6 +372,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -238,11 +238,11 @@ def check_profile_state(module):
 
     esxi_hostname = module.params['esxi_hostname']
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
 
     vc['si'] = si
 
-    host = find_hostsystem_by_name(si, esxi_hostname)
+    host = find_vcenter_object_by_name(si, vim.HostSystem, esxi_hostname)
 
     if not host:
         module.fail_json(msg="Failed getting host: {}".format(esxi_hostname))
@@ -264,7 +264,6 @@ def check_profile_state(module):
     return 'present'
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -305,6 +304,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
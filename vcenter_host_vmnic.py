@@ -84,7 +84,7 @@ class VcenterHostVmnics(object):
         self.module = module
         self.esxi_hostname = module.params['esxi_hostname']
         self.get_type = module.params['obtain']
-        self.vcapi = connect_to_api(self.module)
+        self.vcapi = connect_to_api_cached(self.module)
         self.host = None
         self.available_vmnics = []
 
@@ -153,7 +153,7 @@ class VcenterHostVmnics(object):
         return vswitch_vmnics + proxy_switch_vmnics
 
     def check_state(self):
-        host = find_hostsystem_by_name(self.vcapi, self.esxi_hostname)
+        host = find_vcenter_object_by_name(self.vcapi, vim.HostSystem, self.esxi_hostname)
 
         if not host:
             return False
@@ -184,6 +184,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -91,16 +91,6 @@ except ImportError:
 vc = {}
 
 
-def find_vcenter_object_by_name(content, vimtype, object_name):
-    vcenter_object = get_all_objs(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
-
 def nfs_spec(module):
 
     nfs_remote_host = module.params['nfs_host']
@@ -195,10 +185,10 @@ def check_nfs_host_state(module):
     esxi_hostname = module.params['esxi_hostname']
     nfs_ds_name = module.params['nfs_name']
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
     vc['si'] = si
 
-    host = find_hostsystem_by_name(si, esxi_hostname)
+    host = find_vcenter_object_by_name(si, vim.HostSystem, esxi_hostname)
 
     if host is None:
         module.fail_json(msg="Esxi host: %s not in vcenter".format(esxi_hostname))
@@ -218,7 +208,6 @@ def check_nfs_host_state(module):
             return 'update'
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -267,6 +256,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -228,17 +228,17 @@ def check_pguplink_state(module):
 
     state = 'absent'
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
     vc['si'] = si
 
-    vds = find_dvs_by_name(si, module.params['vds_name'])
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, module.params['vds_name'])
 
     if not vds:
         module.fail_json(msg="Failed to get vds: {}".format(module.params['vds_name']))
 
     vc['vds'] = vds
 
-    pg = find_dvspg_by_name(vds, module.params['pg_name'])
+    pg = find_vds_portgroup_by_name(si, vds, module.params['pg_name'])
 
     if not pg:
         module.fail_json(msg="Failed to get portgroup: {}".format(module.params['pg_name']))
@@ -260,7 +260,6 @@ def check_pguplink_state(module):
     return state
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -298,6 +297,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
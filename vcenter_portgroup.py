@@ -110,23 +110,6 @@ pg_allocation = {'elastic': True,
                  'fixed': False,}
 
 
-def find_vds_by_name(content, vds_name):
-    vdSwitches = get_all_objs(content, [vim.dvs.VmwareDistributedVirtualSwitch])
-    for vds in vdSwitches:
-        if vds_name == vds.name:
-            return vds
-    return None
-
-
-def find_vdspg_by_name(vdSwitch, portgroup_name):
-    portgroups = vdSwitch.portgroup
-
-    for pg in portgroups:
-        if pg.name == portgroup_name:
-            return pg
-    return None
-
-
 def state_exit_unchanged(si, module):
     module.exit_json(changed=False, msg="EXIT UNCHANGED")
 
@@ -141,10 +124,10 @@ def check_pg_spec(si, module):
     state = True
 
     vds_name = module.params['vds_name']
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     pg_name = module.params['port_group_name']
-    pg = find_vdspg_by_name(vds, pg_name)
+    pg = find_vds_portgroup_by_name(si, vds, pg_name)
 
     check_vals = [(pgTypeMap[module.params['port_binding']] == pg.config.type),
                   (pg_allocation[module.params['port_allocation']] == pg.config.autoExpand),]
@@ -176,10 +159,10 @@ def create_pg_spec(si, update, module):
 
     if update:
         vds_name = module.params['vds_name']
-        vds = find_vds_by_name(si, vds_name)
+        vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
         pg_name = module.params['port_group_name']
-        pg = find_vdspg_by_name(vds, pg_name)
+        pg = find_vds_portgroup_by_name(si, vds, pg_name)
 
         port_group_spec.configVersion = pg.config.configVersion
 
@@ -191,7 +174,7 @@ def state_create_port_group(si, module):
     port_group_spec = create_pg_spec(si, False, module)
 
     vds_name = module.params['vds_name']
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     try:
         if not module.check_mode:
@@ -208,10 +191,10 @@ def state_create_port_group(si, module):
 def state_update_port_group(si, module):
 
     vds_name = module.params['vds_name']
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     pg_name = module.params['port_group_name']
-    pg = find_vdspg_by_name(vds, pg_name)
+    pg = find_vds_portgroup_by_name(si, vds, pg_name)
 
     pg_spec = create_pg_spec(si, True, module)
 
@@ -235,9 +218,9 @@ def check_port_group_state(si, module):
     else:
         module.params['vlan'] = None
 
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
-    port_group = find_vdspg_by_name(vds, port_group_name)
+    port_group = find_vds_portgroup_by_name(si, vds, port_group_name)
 
     if port_group is None:
         return 'absent'
@@ -279,10 +262,10 @@ def main():
         }
     }
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
 
     vds_name = module.params['vds_name']
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     if not vds:
         module.fail_json(msg="Could not find vds: {}".format(vds_name))
@@ -295,6 +278,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
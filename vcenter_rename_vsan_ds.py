@@ -90,16 +90,6 @@ except ImportError:
 vc = {}
 
 
-def find_vcenter_object_by_name(content, vimtype, object_name):
-    vcenter_object = get_all_objs(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
-
 def state_delete(module):
     module.exit_json(changed=False, msg="CURRENTLY NOT SUPPORTED")
 
@@ -133,10 +123,9 @@ def state_create(module):
     module.exit_json(changed=changed, result=result)
 
 
-
 def check_ds_state(module):
 
-    content = connect_to_api(module)
+    content = connect_to_api_cached(module)
 
     dc = find_vcenter_object_by_name(content, vim.Datacenter, module.params['datacenter_name'])
 
@@ -145,18 +134,17 @@ def check_ds_state(module):
 
     vc['dc'] = dc
 
-    cluster = find_vcenter_object_by_name(content, vim.ClusterComputeResource, module.params['cluster_name'])
+    cluster = find_vcenter_object_by_name(content, vim.ClusterComputeResource, module.params['cluster_name'],
+                                          dc.hostFolder)
 
     if not cluster:
         module.fail_json(msg="Failed to find cluster")
 
     vc['cluster'] = cluster
 
-    datastores = dc.datastoreFolder.childEntity
-
     ds_name = "{}_VSAN_DS".format(module.params['cluster_name'])
 
-    ds = [d for d in datastores if d.name == ds_name]
+    ds = find_vcenter_object_by_name(content, vim.Datastore, ds_name, dc.datastoreFolder)
 
     if ds:
         return 'present'
@@ -164,7 +152,6 @@ def check_ds_state(module):
         return 'absent'
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -200,6 +187,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,386 @@
+#!/usr/bin/python
+#
+# (c) 2015, Joseph Callen <jcallen () csc.com>
+# Portions Copyright (c) 2015 VMware, Inc. All rights reserved.
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = '''
+module: vcenter_session_broker
+Short_description: Starts or stops a local vCenter session broker
+description:
+    Starts a long lived local process that holds one logged in vCenter session and a
+    name to moId inventory cache, served over a unix socket. Modules run with the
+    VMWARE_SESSION_BROKER environment variable set to the same socket_dir ask the broker
+    for its session and for object lookups instead of logging in and walking the inventory
+    themselves. When no broker is running the modules connect directly.
+    Run the module on the ansible controller (local_action or delegate_to localhost).
+requirements:
+    - pyvmomi 6
+    - ansible 2.x
+Tested on:
+    - vcenter 6.0
+    - pyvmomi 6
+    - ansible 2.1.2
+options:
+    hostname:
+        description:
+            - The hostname or IP address of the vSphere vCenter API server
+        required: True
+    username:
+        description:
+            - The username of the vSphere vCenter with Admin rights
+        required: True
+        aliases: ['user', 'admin']
+    password:
+        description:
+            - The password of the vSphere vCenter user
+        required: True
+        aliases: ['pass', 'pwd']
+    socket_dir:
+        description:
+            - Directory for the broker socket, must match VMWARE_SESSION_BROKER for the modules
+        default: ~/.ansible/vsphere_broker
+    inventory_ttl:
+        description:
+            - Seconds a cached inventory snapshot is served before it is refreshed. A cached
+              hit is checked by reading the name of the object, an object removed or renamed
+              in the meantime refreshes the snapshot
+        default: 60
+    idle_timeout:
+        description:
+            - Seconds without requests after which the broker logs out and exits
+        default: 3600
+    state:
+        description:
+            - present starts the broker, absent stops it
+        choices: ['present', 'absent']
+        required: True
+'''
+
+EXAMPLE = '''
+- name: Start vCenter session broker
+  local_action:
+    module: vcenter_session_broker
+    hostname: "{{ vcenter }}"
+    username: "{{ vcenter_user }}"
+    password: "{{ vcenter_password }}"
+    validate_certs: "{{ vcenter_validate_certs }}"
+    socket_dir: "{{ vsphere_broker_dir }}"
+    state: present
+  run_once: true
+
+- name: Create VDS through the broker session
+  vds:
+    hostname: "{{ vcenter }}"
+    username: "{{ vcenter_user }}"
+    password: "{{ vcenter_password }}"
+    validate_certs: "{{ vcenter_validate_certs }}"
+    datacenter_name: "{{ datacenter.name }}"
+    vds_name: "vds001"
+    numUplinks: 4
+    numPorts: 16
+    mtu: 9000
+    discovery_protocol: 'lldp'
+    discovery_operation: 'both'
+    productVersion: '6.0.0'
+    state: 'present'
+  environment:
+    VMWARE_SESSION_BROKER: "{{ vsphere_broker_dir }}"
+'''
+
+RETURN = '''
+socket:
+  description: path of the broker unix socket
+  type: str
+pid:
+  description: process id of the running broker
+  type: int
+'''
+
+try:
+    import hashlib
+    import json
+    import os
+    import socket
+    import ssl
+    import threading
+    import time
+    import SocketServer
+    from pyVim import connect
+    from pyVmomi import vim, vmodl, VmomiSupport
+    IMPORTS = True
+except ImportError:
+    IMPORTS = False
+
+
+def broker_socket_path(socket_dir, hostname, username):
+    name = hashlib.sha1("%s@%s" % (username, hostname)).hexdigest()
+    return os.path.join(os.path.expanduser(socket_dir), name + '.sock')
+
+
+def broker_call(socket_path, request, timeout=30):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+
+    try:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request) + '\n')
+        reply = sock.makefile().readline()
+    except (socket.error, socket.timeout):
+        return None
+    finally:
+        sock.close()
+
+    if not reply:
+        return None
+
+    return json.loads(reply)
+
+
+class BrokerRequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        broker = self.server.broker
+        broker.last_request = time.time()
+
+        try:
+            request = json.loads(self.rfile.readline())
+            reply = broker.handle_request(request)
+        except Exception as e:
+            reply = {'error': str(e)}
+
+        self.wfile.write(json.dumps(reply) + '\n')
+
+
+class SessionBroker(object):
+    """
+    Holds one logged in vCenter session and an inventory name cache and
+    answers session, lookup, ping and shutdown requests on a unix socket.
+    Requests must carry the sha256 of the vCenter password.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.hostname = module.params['hostname']
+        self.username = module.params['username']
+        self.password = module.params['password']
+        self.inventory_ttl = module.params['inventory_ttl']
+        self.idle_timeout = module.params['idle_timeout']
+        self.socket_path = broker_socket_path(module.params['socket_dir'], self.hostname, self.username)
+        self.auth = hashlib.sha256(self.password).hexdigest()
+        self.service_instance = None
+        self.content = None
+        self.inventory = {}
+        self.lock = threading.Lock()
+        self.last_request = time.time()
+        self.server = None
+
+    def run_state(self):
+        desired_state = self.module.params['state']
+        running = self.request({'op': 'ping'}) is not None
+
+        if desired_state == 'present' and running:
+            self.state_exit_unchanged()
+        if desired_state == 'present':
+            self.state_create()
+        if desired_state == 'absent' and running:
+            self.state_delete()
+
+        self.state_exit_unchanged()
+
+    def request(self, request):
+        request.update({'auth': self.auth})
+        return broker_call(self.socket_path, request)
+
+    def state_exit_unchanged(self):
+        reply = self.request({'op': 'ping'}) or {}
+        self.module.exit_json(changed=False, socket=self.socket_path, pid=reply.get('pid'))
+
+    def state_delete(self):
+        self.request({'op': 'shutdown'})
+        self.module.exit_json(changed=True, socket=self.socket_path, msg="STATE DELETE")
+
+    def state_create(self):
+        # log in before forking so credential errors are reported to the play
+        self.login()
+
+        socket_dir = os.path.dirname(self.socket_path)
+        if not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir, 0o700)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        if os.fork() == 0:
+            os.setsid()
+            if os.fork() == 0:
+                self.serve()
+            os._exit(0)
+
+        for _ in range(30):
+            reply = self.request({'op': 'ping'})
+            if reply:
+                self.module.exit_json(changed=True, socket=self.socket_path, pid=reply['pid'], msg="STATE CREATE")
+            time.sleep(1)
+
+        self.module.fail_json(msg="Broker did not start listening on {}".format(self.socket_path))
+
+    def login(self):
+        ssl_context = None
+        if not self.module.params['validate_certs']:
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            ssl_context.verify_mode = ssl.CERT_NONE
+
+        try:
+            self.service_instance = connect.SmartConnect(host=self.hostname, user=self.username,
+                                                         pwd=self.password, sslContext=ssl_context)
+        except vim.fault.InvalidLogin as invalid_login:
+            self.module.fail_json(msg=invalid_login.msg)
+        except Exception as e:
+            self.module.fail_json(msg="Unable to connect to vCenter {}: {}".format(self.hostname, e))
+
+        self.content = self.service_instance.RetrieveContent()
+        self.inventory = {}
+
+    def ensure_session(self):
+        try:
+            if self.content.sessionManager.currentSession:
+                return
+        except vim.fault.NotAuthenticated:
+            pass
+        self.login()
+
+    def serve(self):
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+
+        os.umask(0o077)
+        self.server = SocketServer.ThreadingUnixStreamServer(self.socket_path, BrokerRequestHandler)
+        self.server.daemon_threads = True
+        self.server.broker = self
+
+        keepalive = threading.Thread(target=self.keepalive)
+        keepalive.daemon = True
+        keepalive.start()
+
+        try:
+            self.server.serve_forever()
+        finally:
+            try:
+                connect.Disconnect(self.service_instance)
+            except Exception:
+                pass
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            os._exit(0)
+
+    def keepalive(self):
+        while True:
+            time.sleep(60)
+
+            if time.time() - self.last_request > self.idle_timeout:
+                self.server.shutdown()
+                return
+
+            with self.lock:
+                try:
+                    self.ensure_session()
+                except Exception:
+                    pass
+
+    def cached_hit_valid(self, moid, wsdl_name, name):
+        """
+        Reads the name of a cached object back through the PropertyCollector,
+        so an object removed or renamed within inventory_ttl is not returned
+        """
+        obj = VmomiSupport.GetWsdlType('urn:vim25', wsdl_name)(moid, self.service_instance._stub)
+        try:
+            return obj.name == name
+        except vmodl.fault.ManagedObjectNotFound:
+            return False
+
+    def lookup(self, vimtype_name, name):
+        vimtype = VmomiSupport.GetWsdlType('urn:vim25', vimtype_name)
+        cached = self.inventory.get(vimtype_name)
+
+        if cached and (time.time() - cached['time']) <= self.inventory_ttl and name in cached['names']:
+            moid, wsdl_name = cached['names'][name]
+            if self.cached_hit_valid(moid, wsdl_name, name):
+                return moid, wsdl_name
+            cached = None
+
+        if not cached or (time.time() - cached['time']) > self.inventory_ttl or name not in cached['names']:
+            objs = get_all_objs_props(self.content, [vimtype])
+            cached = {'time': time.time(),
+                      'names': dict((props['name'], (obj._moId, obj._wsdlName)) for obj, props in objs.items())}
+            self.inventory[vimtype_name] = cached
+
+        return cached['names'].get(name, (None, None))
+
+    def handle_request(self, request):
+        if request.get('auth') != self.auth:
+            return {'error': 'authentication failed'}
+
+        op = request.get('op')
+
+        if op == 'ping':
+            return {'pid': os.getpid()}
+
+        if op == 'shutdown':
+            threading.Thread(target=self.server.shutdown).start()
+            return {'pid': os.getpid()}
+
+        with self.lock:
+            self.ensure_session()
+
+            if op == 'session':
+                stub = self.service_instance._stub
+                return {'cookie': stub.cookie, 'version': stub.version}
+
+            if op == 'lookup':
+                moid, wsdl_name = self.lookup(request['type'], request['name'])
+                return {'moid': moid, 'type': wsdl_name}
+
+        return {'error': 'unknown op: {}'.format(op)}
+
+
+def main():
+    argument_spec = vmware_argument_spec()
+
+    argument_spec.update(
+        dict(
+            socket_dir=dict(default='~/.ansible/vsphere_broker', type='str'),
+            inventory_ttl=dict(default=60, type='int'),
+            idle_timeout=dict(default=3600, type='int'),
+            state=dict(default='present', choices=['present', 'absent'], type='str'),
+        )
+    )
+
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+
+    if not IMPORTS:
+        module.fail_json(msg='pyvmomi is required for this module')
+
+    broker = SessionBroker(module)
+    broker.run_state()
+
+from ansible.module_utils.basic import *
+from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
+
+if __name__ == '__main__':
+    main()
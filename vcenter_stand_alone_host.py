@@ -105,6 +105,7 @@ try:
 except ImportError:
     HAS_PYVMOMI = False
 
+
 class AddStandAloneHost(object):
     '''
 
@@ -116,7 +117,7 @@ class AddStandAloneHost(object):
         self.host_name = module.params['esx_hostname']
         self.host_user = module.params['esx_username']
         self.host_password = module.params['esx_password']
-        self.content = connect_to_api(module)
+        self.content = connect_to_api_cached(module)
         self.datacenter = None
         self.host = None
         self.host_folder = None
@@ -147,7 +148,7 @@ class AddStandAloneHost(object):
         changed, result = self.add_host()
 
         if changed:
-            host = find_hostsystem_by_name(self.content, self.host_name)
+            host = find_vcenter_object_by_name(self.content, vim.HostSystem, self.host_name)
 
             vmk = self.get_vsan_vmk(host)
             vmk = vmk.device
@@ -250,14 +251,14 @@ class AddStandAloneHost(object):
         state = 'absent'
 
         try:
-            self.datacenter = find_datacenter_by_name(self.content, self.datacenter_name)
+            self.datacenter = find_vcenter_object_by_name(self.content, vim.Datacenter, self.datacenter_name)
 
             if not self.datacenter:
                 self.module.fail_json(msg="Cannot find DC")
 
             self.host_folder = self.datacenter.hostFolder
 
-            self.host = find_hostsystem_by_name(self.content, self.host_name)
+            self.host = find_vcenter_object_by_name(self.content, vim.HostSystem, self.host_name)
 
             if self.host:
                 check_vmk = self.check_witness_vmk()
@@ -275,7 +276,6 @@ class AddStandAloneHost(object):
         return state
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -302,6 +302,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -135,17 +135,6 @@ VALID_VMK_SERVICE_TYPES = [
 ]
 
 
-def find_vcenter_object_by_name(content, vimtype, object_name):
-
-    vcenter_object = get_all_objs(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
-
 def get_host_vmk():
 
     vmk = None
@@ -461,10 +450,10 @@ def check_vmk_host_state(module):
     if vmk_service_type not in VALID_VMK_SERVICE_TYPES:
         module.params['service_type'] = None
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
     vc['si'] = si
 
-    host = find_hostsystem_by_name(si, esxi_hostname)
+    host = find_vcenter_object_by_name(si, vim.HostSystem, esxi_hostname)
 
     if host is None:
         module.fail_json(msg="Esxi host: {} not found".format(esxi_hostname))
@@ -504,7 +493,6 @@ def check_vmk_host_state(module):
     return state
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -552,6 +540,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -167,7 +167,7 @@ def state_migrate_vss_vds(module):
     host_network_system = host_system.configManager.networkSystem
 
     dv_switch = find_dvs_by_name(content, migrate_switch_name)
-    pg = find_vdspg_by_name(dv_switch, migrate_portgroup_name)
+    pg = find_vds_portgroup_by_name(content, dv_switch, migrate_portgroup_name)
 
     config = vim.host.NetworkConfig()
     config.portgroup = [create_port_group_config(current_switch_name, current_portgroup_name)]
@@ -198,27 +198,13 @@ def check_vmk_current_state(module):
                 if vnic.spec.distributedVirtualPort.switchUuid == dvs.uuid:
                     return "migrate_vds_vss"
 
-def get_all_objects(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    return obj
-
 def find_dvs_by_name(content, vds_name):
-    vdSwitches = get_all_objects(content, [vim.dvs.VmwareDistributedVirtualSwitch])
-    for vds in vdSwitches:
-        if vds_name == vds.name:
+    vdSwitches = get_all_objs_props(content, [vim.dvs.VmwareDistributedVirtualSwitch])
+    for vds, vds_props in vdSwitches.items():
+        if vds_name == vds_props['name']:
             return vds
     return None
 
-def find_vdspg_by_name(vdSwitch, portgroup_name):
-    portgroups = vdSwitch.portgroup
-    for pg in portgroups:
-        if pg.name == portgroup_name:
-            return pg
-    return None
-
 def find_hostsystem_by_name(content, host_name):
     host = find_vcenter_object_by_name(content, vim.HostSystem, host_name)
     if(host != ""):
@@ -227,16 +213,6 @@ def find_hostsystem_by_name(content, host_name):
         print "Host not found"
         return None
 
-def find_vcenter_object_by_name(content, vimtype, object_name):
-
-    vcenter_object = get_all_objects(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
 def main():
 
     argument_spec = dict(
@@ -274,6 +250,7 @@ def main():
 
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.vmware_extras import *
 
 
 if __name__ == '__main__':
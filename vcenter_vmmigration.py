@@ -99,42 +99,20 @@ def connect_to_vcenter(module, disconnect_atexit=True):
     except requests.ConnectionError, connection_error:
         module.fail_json(msg="Unable to connect to vCenter or ESXi API on TCP/443.", apierror=str(connection_error))
 
-def get_all_objs(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    return obj
-
-def wait_for_task(task):
-    while True:
-        if task.info.state == vim.TaskInfo.State.success:
-            return True, task.info.result
-        if task.info.state == vim.TaskInfo.State.error:
-            try:
-                raise Exception(task.info.error)
-            except AttributeError:
-                raise Exception("An unknown error has occurred")
-        if task.info.state == vim.TaskInfo.State.running:
-            time.sleep(15)
-        if task.info.state == vim.TaskInfo.State.queued:
-            time.sleep(15)
-
-
 def _find_dvspg_by_name(content, pg_name):
 
-    vmware_distributed_port_group = get_all_objs(content, [vim.dvs.DistributedVirtualPortgroup])
-    for dvspg in vmware_distributed_port_group:
-        if dvspg.name == pg_name:
+    vmware_distributed_port_group = get_all_objs_props(content, [vim.dvs.DistributedVirtualPortgroup])
+    for dvspg, dvspg_props in vmware_distributed_port_group.items():
+        if dvspg_props['name'] == pg_name:
             return dvspg
     return None
 
 
 def find_vm_by_name(content, vm_name):
 
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
-    for vm in virtual_machines:
-        if vm.name == vm_name:
+    virtual_machines = get_all_objs_props(content, [vim.VirtualMachine])
+    for vm, vm_props in virtual_machines.items():
+        if vm_props['name'] == vm_name:
             return vm
     return None
 
@@ -171,7 +149,7 @@ def migrate_network_adapter_vds(module):
             vm_configspec.deviceChange.append(devicespec)
 
     task = vm.ReconfigVM_Task(vm_configspec)
-    changed, result = wait_for_task(task)
+    changed, result = wait_for_task_updates(task)
     module.exit_json(changed=changed)
 
 def state_exit_unchanged(module):
@@ -219,6 +197,7 @@ def main():
     vm_nic_states[check_vm_network_state(module)](module)
 
 from ansible.module_utils.basic import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -64,8 +64,46 @@ options:
         required: True
     ovftool_path:
         description:
-            - The path where the ovftool is installed
+            - The path where the ovftool is installed, required when deploy_method is ovftool
         ex: /usr/local/bin/ovftool
+    deploy_method:
+        description:
+            - ovftool runs the ovftool binary, native imports the ova through the vSphere api
+              and streams its disks to vcenter without extracting the ova
+        choices: ['ovftool', 'native']
+        default: ovftool
+    max_parallel_uploads:
+        description:
+            - Number of disks uploaded at the same time when deploy_method is native
+        default: 4
+    template_cache:
+        description:
+            - Keep the imported ova as a template named after its sha256 and clone new
+              appliances from it, only the first deploy of an ova uploads its disks.
+              Requires deploy_method native
+        default: False
+    verify_manifest:
+        description:
+            - Check the files of the ova against its manifest before deploying, an ova
+              without a manifest is deployed with a warning
+        default: False
+    hash_cache:
+        description:
+            - File recording verified ovas and their sha256 by path, size and mtime, so an
+              unchanged ova is only hashed once
+        default: ~/.ansible/ova_hash_cache.json
+    upload_slot_dir:
+        description:
+            - Directory of lock files shared by deploys running at the same time, at most
+              upload_slots of them upload to the same datastore at once
+    upload_slots:
+        description:
+            - Number of deploys sharing upload_slot_dir that may upload to one datastore at once
+        default: 1
+    upload_rate_limit:
+        description:
+            - Upper bound for the upload rate of this deploy in MB/s, 0 for no limit
+        default: 0
     path_to_ova:
         description:
             - The path where the ova is located
@@ -168,7 +206,6 @@ sample:
 '''
 
 try:
-    import time
     import requests
     from pyVmomi import vim, vmodl
     IMPORTS = True
@@ -178,68 +215,23 @@ except ImportError:
 
 vc = {}
 
-def check_vro_api(module):
 
+def wait_for_api(module):
     url = "https://{}:8281/vco/api/".format(module.params['vro_ip_address'])
     auth = requests.auth.HTTPBasicAuth('vcoadmin','vcoadmin')
     header = {'Content-Type': 'application/json', 'Accept': 'application/json'}
 
-    try:
-        resp = requests.get(url=url, verify=False,
-                            auth=auth, headers=header)
-
-    except requests.exceptions.ConnectionError:
-        return False
-
-    return resp.status_code, resp.content
-
-
-def wait_for_api(module, sleep_time=15):
-    status_poll_count = 0
-    while status_poll_count < 30:
-        api_status = check_vro_api(module)
-        if api_status:
-            if api_status[0] == 200:
-                return True
-            else:
-                status_poll_count += 1
-                time.sleep(sleep_time)
-        else:
-            status_poll_count += 1
-            time.sleep(sleep_time)
-
-        if status_poll_count == 30:
-            return False
-
-
-
-def wait_for_vm(vm, sleep_time=15):
-
-    vm_pool_count = 0
-    while vm_pool_count < 30:
-        connected = (vm.runtime.connectionState == 'connected')
-
-        if connected:
-            powered_on = (vm.runtime.powerState == 'poweredOn')
-
-            if powered_on:
-                return True
-            else:
-                vm_pool_count += 1
-                time.sleep(sleep_time)
-        else:
-            vm_pool_count += 1
-            time.sleep(sleep_time)
-
-        if vm_pool_count == 30:
-            return False
+    probe = ReadinessProbe()
+    ready = probe.wait(url, auth=auth, headers=header)
+    vc['api_probe'] = probe.report()
 
+    return ready
 
 
 def find_virtual_machine(content, searched_vm_name):
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
-    for vm in virtual_machines:
-        if vm.name == searched_vm_name:
+    virtual_machines = get_all_objs_props(content, [vim.VirtualMachine])
+    for vm, vm_props in virtual_machines.items():
+        if vm_props['name'] == searched_vm_name:
             return vm
     return None
 
@@ -266,14 +258,61 @@ def state_exit_unchanged(module):
     module.exit_json(changed=False, msg="EXIT UNCHANED")
 
 
+def ova_properties(module):
+    return {
+        'varoot-password': module.params['vro_root_pass'],
+        'vcoconf-password': module.params['vro_root_pass'],
+        'va-ssh-enabled': module.params['enable_ssh'],
+        'vami.hostname': module.params['vro_hostname'],
+        'vami.gateway.VMware_vRealize_Orchestrator_Appliance': module.params['vro_gateway'],
+        'vami.domain.VMware_vRealize_Orchestrator_Appliance': module.params['vro_domain'],
+        'vami.DSN.VMware_vRealize_Orchestrator_Appliance': '{},{}'.format(module.params['vro_dns_ip'][0],
+                                                                          module.params['vro_dns_ip'][1]),
+        'vami.ip0.VMware_vRealize_Orchestrator_Appliance': module.params['vro_ip_address'],
+        'vami.netmask0.VMware_vRealize_Orchestrator_Appliance': module.params['vro_netmask'],
+    }
+
+
+def state_create_vm_native(module):
+    ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
+
+    deployer = OvaDeployer(module, vc['content'], ova_file, module.params['max_parallel_uploads'],
+                           hash_cache=module.params['hash_cache'],
+                           upload_slot_dir=module.params['upload_slot_dir'],
+                           upload_slots=module.params['upload_slots'],
+                           upload_rate_limit=module.params['upload_rate_limit'] * 1024 * 1024)
+    deploy = deployer.deploy_cached if module.params['template_cache'] else deployer.deploy
+    vc['deploy'] = deploy(module.params['datacenter'], module.params['cluster'],
+                          module.params['datastore'], module.params['vmname'],
+                          module.params['disk_mode'], {'*': module.params['network']},
+                          ova_properties(module))
+
+    return 0
+
+
+def verify_ova_manifest(module):
+    ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
+
+    deployer = OvaDeployer(module, vc['content'], ova_file, hash_cache=module.params['hash_cache'])
+    vc['manifest'] = deployer.verify_manifest()
+
+
 def state_create_vm(module):
 
+    if module.params['verify_manifest']:
+        verify_ova_manifest(module)
+
+    if module.params['deploy_method'] == 'native':
+        return state_create_vm_native(module)
+
     ovftool_exec = '{}/ovftool'.format(module.params['ovftool_path'])
     ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
     vi_string = 'vi://{}:{}@{}/{}/host/{}/'.format(module.params['username'],
                                                    module.params['password'], module.params['hostname'],
                                                    module.params['datacenter'], module.params['cluster'])
 
+    ova_props = ['--prop:{}={}'.format(k, v) for k, v in ova_properties(module).items()]
+
     ova_tool_result = module.run_command([ovftool_exec,
                                           '--acceptAllEulas',
                                           '--skipManifestCheck',
@@ -283,18 +322,9 @@ def state_create_vm(module):
                                           '--diskMode={}'.format(module.params['disk_mode']),
                                           '--datastore={}'.format(module.params['datastore']),
                                           '--network={}'.format(module.params['network']),
-                                          '--name={}'.format(module.params['vmname']),
-                                          '--prop:varoot-password={}'.format(module.params['vro_root_pass']),
-                                          '--prop:vcoconf-password={}'.format(module.params['vro_root_pass']),
-                                          '--prop:va-ssh-enabled={}'.format(module.params['enable_ssh']),
-                                          '--prop:vami.hostname={}'.format(module.params['vro_hostname']),
-                                          '--prop:vami.gateway.VMware_vRealize_Orchestrator_Appliance={}'.format(module.params['vro_gateway']),
-                                          '--prop:vami.domain.VMware_vRealize_Orchestrator_Appliance={}'.format(module.params['vro_domain']),
-                                          '--prop:vami.DSN.VMware_vRealize_Orchestrator_Appliance={},{}'.format(module.params['vro_dns_ip'][0],
-                                                                                                                module.params['vro_dns_ip'][1]),
-                                          '--prop:vami.ip0.VMware_vRealize_Orchestrator_Appliance={}'.format(module.params['vro_ip_address']),
-                                          '--prop:vami.netmask0.VMware_vRealize_Orchestrator_Appliance={}'.format(module.params['vro_netmask']),
-                                          ova_file,
+                                          '--name={}'.format(module.params['vmname'])] +
+                                         ova_props +
+                                         [ova_file,
                                           vi_string])
 
     if ova_tool_result[0] != 0:
@@ -309,7 +339,15 @@ def main():
     argument_spec.update(
         dict(
             vmname=dict(required=True, type='str'),
-            ovftool_path=dict(required=True, type='str'),
+            ovftool_path=dict(required=False, type='str'),
+            deploy_method=dict(default='ovftool', choices=['ovftool', 'native']),
+            max_parallel_uploads=dict(default=4, type='int'),
+            template_cache=dict(default=False, type='bool'),
+            verify_manifest=dict(default=False, type='bool'),
+            hash_cache=dict(default='~/.ansible/ova_hash_cache.json', type='str'),
+            upload_slot_dir=dict(required=False, type='str'),
+            upload_slots=dict(default=1, type='int'),
+            upload_rate_limit=dict(default=0, type='int'),
             path_to_ova=dict(required=True, type='str'),
             ova_file=dict(required=True, type='str'),
             datacenter=dict(required=True, type='str'),
@@ -334,7 +372,14 @@ def main():
     if not IMPORTS:
         module.fail_json(msg="Failed to import modules")
 
-    content = connect_to_api(module)
+    if module.params['deploy_method'] == 'ovftool' and not module.params['ovftool_path']:
+        module.fail_json(msg="ovftool_path is required when deploy_method is ovftool")
+
+    if module.params['template_cache'] and module.params['deploy_method'] != 'native':
+        module.fail_json(msg="template_cache requires deploy_method native")
+
+    content = connect_to_api_cached(module)
+    vc['content'] = content
 
     vro_vm = find_virtual_machine(content, module.params['vmname'])
 
@@ -365,17 +410,22 @@ def main():
     if not vro_vm:
         module.fail_json(changed=False, msg="Failed to find vm")
 
-    if not wait_for_vm(vro_vm):
-        module.fail_json(msg="VM failed to power on")
+    vc['vm_ready'] = wait_for_vm(vro_vm)
+
+    if not vc['vm_ready']:
+        module.fail_json(msg="VM failed to power on or report an ip address")
 
     if not wait_for_api(module):
-        module.fail_json(msg="Failed to hit api")
+        module.fail_json(msg="Failed to hit api", api_probe=vc.get('api_probe'))
 
-    module.exit_json(changed=True, result="Success")
+    module.exit_json(changed=True, result="Success", deploy=vc.get('deploy'),
+                     manifest=vc.get('manifest'), vm_ready=vc.get('vm_ready'),
+                     api_probe=vc.get('api_probe'))
 
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
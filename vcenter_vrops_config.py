@@ -71,15 +71,17 @@ EXAMPLES = '''
 '''
 
 RETURN = '''
-description: Module currently in WIP
-returned: 
-type: 
-sample: 
+result:
+  description: changes planned from the read probes with name, current and desired value,
+               and the seconds the probes took
+  returned: state present
+  type: dict
 '''
 
 try:
     import time
     import requests
+    from multiprocessing.pool import ThreadPool
     IMPORTS = True
 except ImportError:
     IMPORTS = False
@@ -125,8 +127,9 @@ class VropsRestClientExceptions(Exception):
 
 class VropsRestClient(object):
     """ A basic vROPs rest client to configure the appliance
+    All calls share one pooled session, closed by close
     """
-    def __init__(self, username, password, server):
+    def __init__(self, username, password, server, pool_maxsize=8):
         super(VropsRestClient, self).__init__()
         self._username       = username
         self._password       = password
@@ -135,6 +138,14 @@ class VropsRestClient(object):
         self._base_user_url  = 'https://%s/suite-api/api/%s'
         self._base_admin_url = 'https://%s/casa/%s'
         self.auth            = (self._username, self._password)
+        self.session         = requests.Session()
+        self.session.verify  = False
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1,
+                                                                     pool_maxsize=pool_maxsize,
+                                                                     pool_block=True))
+
+    def close(self):
+        self.session.close()
 
     def do_request(self, request_type, status_codes, params):
         """Returns status code of rest call and json content
@@ -148,14 +159,7 @@ class VropsRestClient(object):
         status_code = None
 
         try:
-            if request_type == 'get':
-                resp = requests.get(**params)
-            if request_type == 'put':
-                resp = requests.put(**params)
-            if request_type == 'post':
-                resp = requests.post(**params)
-            if request_type == 'delete':
-                resp = requests.delete(**params)
+            resp = self.session.request(request_type.upper(), **params)
             status_code = resp.status_code
         except (requests.exceptions.ConnectionError, requests.RequestException) as conn_error:
             msg = "Failed Request GET Error: %s " % str(conn_error)
@@ -195,6 +199,19 @@ class VropsRestClient(object):
 
         return state
 
+    def read(self, url_type, path):
+        """Returns json content of a get on the admin or user api
+        :param url_type: admin for casa, user for suite-api
+        :param path: api path
+        """
+        _url   = self.api_url(url_type, path)
+        params = {'url': _url, 'auth': self.auth,
+                  'headers': _headers, 'verify': False}
+
+        status_code, content = self.do_request('get', [200], params)
+
+        return content
+
     def body_to_json(self, body):
         json_body = None
 
@@ -221,32 +238,6 @@ class VropsRestClient(object):
 
         return update_list
 
-    def ntp_state(self, ntp_servers):
-        """Returns bool, list of ntp servers to update
-        :param ntp_servers: list of desired ntp servers
-        """
-        state    = False
-        ntp_list = None
-        path     = _sysadmin % _cluster % ntp
-        url      = self.api_url('admin', path)
-
-        params = {'url': url, 'auth': self.auth,
-                  'headers': _headers, 'verify': False}
-
-        status_code, content = self.do_request('get', [200], params)
-
-        if not content['time_servers']:
-            log("Currently no ntp servers set state: %s " % state)
-            log("ntp_servers: %s " % ntp_servers)
-            return False, ntp_servers
-
-        ntp_list = self._update_ntp_servers(ntp_servers, content)
-
-        if not ntp_list:
-            state = True
-
-        return state, ntp_list
-
     def ntp_body(self, ntp_servers):
         body = {'time_servers': []}
         for ntp in ntp_servers:
@@ -266,15 +257,6 @@ class VropsRestClient(object):
 
         return state
 
-    def configure_ntp(self, ntp_servers):
-        ntp_state, ntp_list = self.ntp_state(ntp_servers)
-
-        if ntp_state:
-            return ntp_state
-
-        set_ntp_servers = self.set_ntp(ntp_list)
-        return set_ntp_servers
-
     def reset_admin_password(self):
         path   = _security % adminpassword
         _url   = self.api_url('admin', path)
@@ -291,7 +273,26 @@ class VropsRestClient(object):
 
         return True
 
+    def admin_password_set(self):
+        """Returns False when casa refuses the admin login, the initial
+        admin password has not been set yet
+        """
+        _url   = self.api_url('admin', _deployment % slice_)
+        params = {'url': _url, 'auth': self.auth,
+                  'headers': _headers, 'verify': False}
+
+        try:
+            resp = self.session.request('GET', **params)
+        except requests.RequestException as conn_error:
+            msg = "Failed Request GET Error: %s " % str(conn_error)
+            raise VropsRestClientExceptions(msg=msg)
+
+        return resp.status_code != 401
+
     def set_admin_init_password(self):
+        """Returns True when the initial admin password was set, False
+        when it was already set and the password still works
+        """
         state    = False
         path     = _security % admin_pass % (adminpassword, admin_pass_init)
         _url     = self.api_url('admin', path)
@@ -303,23 +304,10 @@ class VropsRestClient(object):
 
         status_code, content = self.do_request('put', [200, 500], params)
 
-        if status_code == 500:
-            state = self.reset_admin_password()
-
-        return state
-
-    def admin_role_state(self):
-        state  = False
-        path   = _deployment % _slice % _role % _status
-        _url   = self._base_admin_url % (self._server, path)
-
-        params = {'url': _url, 'auth': self.auth,
-                  'verify': False, 'headers': _headers}
-
-        status_code, content = self.do_request('get', [200], params)
-
-        if status_code:
-            state = content['configurationRunning']
+        if status_code == 200:
+            state = True
+        else:
+            self.reset_admin_password()
 
         return state
 
@@ -344,27 +332,6 @@ class VropsRestClient(object):
         state, content = self.do_request('post', [202], params)
         return state
 
-    def admin_role(self):
-        set_role = False
-
-        if not self.admin_role_state():
-            set_role = self.set_admin_role()
-
-        return set_role
-
-    def cluster_state_name(self, cluster_name):
-        state    = False
-        path     = _deployment % _cluster % _info
-        _url     = self._base_admin_url % (self._server, path)
-        params   = {'url': _url, 'verify': False, 'auth': self.auth, 'headers': _headers}
-
-        status_code, content = self.do_request('get', [200], params)
-
-        if status_code == 200:
-            state = (content['cluster_name'] == cluster_name)
-
-        return state
-
     def configure_cluster(self, cluster_name):
         state    = False
         path     = _deployment % _cluster % _info
@@ -378,26 +345,6 @@ class VropsRestClient(object):
         status_code, content = self.do_request('put', [200], params)
         return state
 
-    def configure_cluster_name(self, cluster_name):
-        state = False
-        if not self.cluster_state_name(cluster_name):
-            state = self.configure_cluster(cluster_name)
-        return state
-
-    def slice_state_name(self):
-        state  = False
-        path   = _deployment % slice_
-        _url   = self._base_admin_url % (self._server, path)
-        params = {'url': _url, 'verify': False,
-                  'auth': self.auth, 'headers': _headers}
-
-        status_code, content = self.do_request('get', [200], params)
-
-        if content['slice_name'] == self._server:
-            state = True
-
-        return state
-
     def configure_slice(self):
         state  = False
         path   = _deployment % _slice % self._server
@@ -408,18 +355,10 @@ class VropsRestClient(object):
         params = {'url': _url, 'verify': False, 'data': _body,
                   'auth': self.auth, 'headers': _headers}
 
-        status_code, content = self.do_request('put', [200], params)
-
-        state = self.slice_state_name()
+        state, content = self.do_request('put', [200], params)
 
         return state
 
-    def configure_slice_name(self):
-        state = False
-        if not self.slice_state_name():
-            state = self.configure_slice()
-        return state
-
 class VropsConfig(object):
     """
     """
@@ -432,6 +371,7 @@ class VropsConfig(object):
         self.admin_pass   = module.params['password']
         self._server      = module.params['vrops_ip_addess']
         self._ntp_servers = module.params['ntp_servers']
+        self.cluster_name = module.params['cluster_name']
         self.vrops_client = VropsRestClient(self.admin, self.admin_pass, self._server)
 
     def _fail(self, msg=None):
@@ -439,6 +379,7 @@ class VropsConfig(object):
         :param msg: defaults to None
         """
         if not msg: msg = "General Error occured"
+        self.vrops_client.close()
         self.module.fail_json(msg=msg)
 
     def state_exit_unchanged(self):
@@ -456,6 +397,76 @@ class VropsConfig(object):
 
         return changed, result, msg
 
+    def probes(self):
+        """Returns list of read probes, name, api type and path"""
+        probes = [('admin_role', 'admin', _deployment % _slice % _role % _status),
+                  ('slice', 'admin', _deployment % slice_)]
+
+        if self._ntp_servers:
+            probes.append(('ntp', 'admin', _sysadmin % _cluster % ntp))
+        if self.cluster_name:
+            probes.append(('cluster', 'admin', _deployment % _cluster % _info))
+
+        return probes
+
+    def run_probe(self, probe):
+        name, url_type, path = probe
+
+        try:
+            content = self.vrops_client.read(url_type, path)
+        except VropsRestClientExceptions as e:
+            return name, e
+
+        return name, content
+
+    def run_probes(self):
+        """Returns dict of probe name and content, all probes
+        are read at the same time on the pooled session
+        """
+        probes = self.probes()
+        pool = ThreadPool(len(probes))
+
+        try:
+            reads = dict(pool.map(self.run_probe, probes))
+        finally:
+            pool.close()
+            pool.join()
+
+        for name, content in reads.items():
+            if isinstance(content, VropsRestClientExceptions):
+                self._fail("Failed to read %s: %s" % (name, content.msg))
+
+        return reads
+
+    def plan(self, reads):
+        """Returns list of changes, name, current, desired and the
+        write that applies it
+        :param reads: dict from run_probes
+        """
+        changes = []
+
+        if 'ntp' in reads:
+            current    = [n['address'] for n in reads['ntp']['time_servers']]
+            update     = self._ntp_servers
+            if current:
+                update = self.vrops_client._update_ntp_servers(self._ntp_servers, reads['ntp'])
+            if update:
+                changes.append(('ntp', current, self._ntp_servers,
+                                lambda: self.vrops_client.set_ntp(update)))
+
+        if not reads['admin_role']['configurationRunning']:
+            changes.append(('admin_role', False, True, self.vrops_client.set_admin_role))
+
+        if 'cluster' in reads and reads['cluster']['cluster_name'] != self.cluster_name:
+            changes.append(('cluster_name', reads['cluster']['cluster_name'], self.cluster_name,
+                            lambda: self.vrops_client.configure_cluster(self.cluster_name)))
+
+        if reads['slice']['slice_name'] != self._server:
+            changes.append(('slice_name', reads['slice']['slice_name'], self._server,
+                            self.vrops_client.configure_slice))
+
+        return changes
+
     def state_create(self):
         """Returns changed result and msg"""
         changed = False
@@ -468,15 +479,42 @@ class VropsConfig(object):
             msg = "API should be ready but is not"
             self._fail(msg)
 
-        if self.module.params['set_admin_pass']:
-            admin_password_state = self.vrops_client.set_admin_init_password()
-
-        if 'ntp_servers' in self.module.params:
-            _ntp_state = self.vrops_client.configure_ntp(self._ntp_servers)
+        planned = []
 
-        admin_role    = self.vrops_client.admin_role()
-        cluster_name  = self.vrops_client.configure_cluster_name(self.module.params['cluster_name'])
-        slice_name    = self.vrops_client.configure_slice_name()
+        if self.module.params['set_admin_pass']:
+            try:
+                if self.module.check_mode:
+                    password_changed = not self.vrops_client.admin_password_set()
+                else:
+                    password_changed = self.vrops_client.set_admin_init_password()
+            except VropsRestClientExceptions as e:
+                self._fail("Failed to set admin password: %s" % e.msg)
+
+            if password_changed:
+                planned.append({'name': 'admin_password', 'current': None, 'desired': None})
+
+            # without the password nothing else can be read
+            if password_changed and self.module.check_mode:
+                return True, {'changes': planned, 'probe_time': 0}, msg
+
+        probe_start = time.time()
+        reads = self.run_probes()
+        probe_time = round(time.time() - probe_start, 2)
+
+        changes = self.plan(reads)
+
+        for name, current, desired, apply_change in changes:
+            planned.append({'name': name, 'current': current, 'desired': desired})
+            if self.module.check_mode:
+                continue
+            try:
+                apply_change()
+            except VropsRestClientExceptions as e:
+                self._fail("Failed to configure %s: %s" % (name, e.msg))
+
+        changed = bool(planned)
+        result = {'changes': planned,
+                  'probe_time': probe_time}
 
         return changed, result, msg
 
@@ -499,6 +537,7 @@ class VropsConfig(object):
         if desired_state == 'present' and current_state == 'absent':
             changed, result, msg = self.state_create()
 
+        self.vrops_client.close()
         self.module.exit_json(changed=changed, result=result, msg=msg)
 
     def check_state(self):
@@ -516,7 +555,7 @@ def main():
                          state=dict(default='present', choices=['present', 'absent']),)
 
     module = AnsibleModule(argument_spec=argument_spec,
-                           supports_check_mode=False)
+                           supports_check_mode=True)
 
     if not IMPORTS:
         module.fail_json(msg="Failed to import modules")
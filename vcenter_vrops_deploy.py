@@ -69,8 +69,46 @@ options:
         required: True
     ovftool_path:
         description:
-            - The path where the ovftool is installed
+            - The path where the ovftool is installed, required when deploy_method is ovftool
         ex: /usr/local/bin/ovftool
+    deploy_method:
+        description:
+            - ovftool runs the ovftool binary, native imports the ova through the vSphere api
+              and streams its disks to vcenter without extracting the ova
+        choices: ['ovftool', 'native']
+        default: ovftool
+    max_parallel_uploads:
+        description:
+            - Number of disks uploaded at the same time when deploy_method is native
+        default: 4
+    template_cache:
+        description:
+            - Keep the imported ova as a template named after its sha256 and clone new
+              appliances from it, only the first deploy of an ova uploads its disks.
+              Requires deploy_method native
+        default: False
+    verify_manifest:
+        description:
+            - Check the files of the ova against its manifest before deploying, an ova
+              without a manifest is deployed with a warning
+        default: False
+    hash_cache:
+        description:
+            - File recording verified ovas and their sha256 by path, size and mtime, so an
+              unchanged ova is only hashed once
+        default: ~/.ansible/ova_hash_cache.json
+    upload_slot_dir:
+        description:
+            - Directory of lock files shared by deploys running at the same time, at most
+              upload_slots of them upload to the same datastore at once
+    upload_slots:
+        description:
+            - Number of deploys sharing upload_slot_dir that may upload to one datastore at once
+        default: 1
+    upload_rate_limit:
+        description:
+            - Upper bound for the upload rate of this deploy in MB/s, 0 for no limit
+        default: 0
     path_to_ova:
         description:
             - The path where the ova is located
@@ -135,8 +173,6 @@ sample:
 '''
 
 try:
-    import time
-    import requests
     from pyVmomi import vim, vmodl
     IMPORTS = True
 except ImportError:
@@ -160,13 +196,15 @@ class VropsDeploy(object):
         """
         super(VropsDeploy, self).__init__()
         self.module          = module
-        self.si              = connect_to_api(module)
+        self.si              = connect_to_api_cached(module)
         self.name            = module.params['vmname']
         self.datacenter_name = module.params['datacenter']
         self.cluster_name    = module.params['cluster']
         self.datastore_name  = module.params['datastore']
         self.network_name    = module.params['network']
         self.vm              = None
+        self.manifest        = None
+        self.api_probe       = None
 
     def _fail(self, msg=None):
         """Fail from AnsibleModule
@@ -213,11 +251,22 @@ class VropsDeploy(object):
         result = {'name': self.vm.name,
                   'moId': self.vm._moId}
 
-        if not self.power_state_wait(self.vm):
-            msg = "Failed to wait for power on"
+        if isinstance(ova_deploy, dict):
+            result.update({'deploy': ova_deploy})
+        if self.manifest:
+            result.update({'manifest': self.manifest})
+
+        vm_ready = wait_for_vm(self.vm)
+        result.update({'vm_ready': vm_ready})
+
+        if not vm_ready:
+            msg = "Failed to wait for power on and guest ip address"
             return changed, result, msg
 
-        if not self.wait_for_api():
+        ready = self.wait_for_api()
+        result.update({'api_probe': self.api_probe})
+
+        if not ready:
             msg = "Failed waiting on api"
             return changed, result, msg
 
@@ -246,11 +295,46 @@ class VropsDeploy(object):
         self.module.exit_json(changed=changed, result=result, msg=msg)
 
     def get_vm(self, vm_name):
-        vm = find_vm_by_name(self.si, vm_name)
+        vm = find_vcenter_object_by_name(self.si, vim.VirtualMachine, vm_name)
         return vm
 
+    def ova_properties(self):
+        return {
+            'vami.gateway.vRealize_Operations_Manager_Appliance': self.module.params['gateway'],
+            'vami.DNS.vRealize_Operations_Manager_Appliance': self.module.params['dns_server'],
+            'vami.ip0.vRealize_Operations_Manager_Appliance': self.module.params['ip_address'],
+            'vami.netmask0.vRealize_Operations_Manager_Appliance': self.module.params['netmask'],
+            'guestinfo.cis.appliance.ssh.enabled': self.module.params['enable_ssh'],
+        }
+
+    def deploy_ova_native(self):
+        ova_file = '{}/{}'.format(self.module.params['path_to_ova'], self.module.params['ova_file'])
+
+        deployer = OvaDeployer(self.module, self.si, ova_file, self.module.params['max_parallel_uploads'],
+                               hash_cache=self.module.params['hash_cache'],
+                               upload_slot_dir=self.module.params['upload_slot_dir'],
+                               upload_slots=self.module.params['upload_slots'],
+                               upload_rate_limit=self.module.params['upload_rate_limit'] * 1024 * 1024)
+        deploy = deployer.deploy_cached if self.module.params['template_cache'] else deployer.deploy
+        return deploy(self.datacenter_name, self.cluster_name, self.datastore_name, self.name,
+                      self.module.params['disk_mode'], {'*': self.network_name},
+                      self.ova_properties(), self.module.params['deployment_size'],
+                      self.module.params['ip_protocol'])
+
+    def verify_ova_manifest(self):
+        ova_file = '{}/{}'.format(self.module.params['path_to_ova'], self.module.params['ova_file'])
+
+        deployer = OvaDeployer(self.module, self.si, ova_file, hash_cache=self.module.params['hash_cache'])
+        return deployer.verify_manifest()
+
     def deploy_ova(self):
 
+        if self.module.params['verify_manifest']:
+            self.manifest = self.verify_ova_manifest()
+
+        if self.module.params['deploy_method'] == 'native':
+            return self.deploy_ova_native()
+
         ovftool_exec = '{}/ovftool'.format(self.module.params['ovftool_path'])
         ova_file = '{}/{}'.format(self.module.params['path_to_ova'], self.module.params['ova_file'])
         vi_string = 'vi://{}:{}@{}/{}/host/{}/'.format(self.module.params['username'],
@@ -271,13 +355,9 @@ class VropsDeploy(object):
                                                   '--network={}'.format(self.network_name),
                                                   '--name={}'.format(self.name),
                                                   '--ipProtocol={}'.format(self.module.params['ip_protocol']),
-                                                  '--deploymentOption={}'.format(self.module.params['deployment_size']),
-                                                  '--prop:vami.gateway.vRealize_Operations_Manager_Appliance={}'.format(self.module.params['gateway']),
-                                                  '--prop:vami.DNS.vRealize_Operations_Manager_Appliance={}'.format(self.module.params['dns_server']),
-                                                  '--prop:vami.ip0.vRealize_Operations_Manager_Appliance={}'.format(self.module.params['ip_address']),
-                                                  '--prop:vami.netmask0.vRealize_Operations_Manager_Appliance={}'.format(self.module.params['netmask']),
-                                                  '--prop:guestinfo.cis.appliance.ssh.enabled={}'.format(self.module.params['enable_ssh']),
-                                                  ova_file,
+                                                  '--deploymentOption={}'.format(self.module.params['deployment_size'])] +
+                                                 ['--prop:{}={}'.format(k, v) for k, v in self.ova_properties().items()] +
+                                                 [ova_file,
                                                   vi_string])
 
         if ova_tool_result[0] != 0:
@@ -285,75 +365,33 @@ class VropsDeploy(object):
 
         return ova_tool_result[0]
 
-    def power_state_wait(self, vm, sleep_time=15):
-        vm_pool_count = 0
-        while vm_pool_count < 30:
-
-            connected = (vm.runtime.connectionState == 'connected')
-
-            if connected:
-                powered_on = (vm.runtime.powerState == 'poweredOn')
-
-                if powered_on:
-                    return True
-                else:
-                    vm_pool_count += 1
-                    time.sleep(sleep_time)
-            else:
-                vm_pool_count += 1
-                time.sleep(sleep_time)
-            if vm_pool_count == 30:
-                return False
-
-    def check_api(self):
+    def wait_for_api(self):
         url = "https://{}".format(self.module.params['ip_address'])
         header = {'Content-Type': 'application/json'}
 
-        try:
-            resp = requests.get(url=url, verify=False, headers=header)
-        except requests.exceptions.ConnectionError:
-            return False
-
-        return resp.status_code
+        probe = ReadinessProbe()
+        ready = probe.wait(url, headers=header)
+        self.api_probe = probe.report()
 
-    def wait_for_api(self, sleep_time=15):
-        status_poll_count = 0
-        while status_poll_count < 30:
-
-            api_status = self.check_api()
-
-            if api_status:
-                if api_status == 200:
-                    return True
-                else:
-                    status_poll_count += 1
-                    time.sleep(sleep_time)
-            else:
-                status_poll_count += 1
-                time.sleep(sleep_time)
-
-            if status_poll_count == 30:
-                return False
+        return ready
 
     def check_vcenter_objects(self):
         state = False
 
-        datacenter = find_datacenter_by_name(self.si, self.datacenter_name)
+        datacenter = find_vcenter_object_by_name(self.si, vim.Datacenter, self.datacenter_name)
 
         if not datacenter:
             return state
 
-        cluster   = None
-        datastore = None
+        cluster = find_vcenter_object_by_name(self.si, vim.ComputeResource, self.cluster_name,
+                                              datacenter.hostFolder)
 
-        try:
-            cluster = [c for c in datacenter.hostFolder.childEntity if c.name == self.cluster_name][0]
-        except IndexError:
+        if not cluster:
             return state
 
-        try:
-            datastore = [d for d in cluster.datastore if d.name == self.datastore_name][0]
-        except IndexError:
+        datastore = find_vcenter_object_by_name(self.si, vim.Datastore, self.datastore_name, datacenter)
+
+        if not datastore or datastore not in cluster.datastore:
             return state
 
         return True
@@ -367,7 +405,7 @@ class VropsDeploy(object):
             msg = "Failed to get vcenter object depenedencies"
             self._fail(msg)
 
-        self.vm = find_vm_by_name(self.si, self.name)
+        self.vm = find_vcenter_object_by_name(self.si, vim.VirtualMachine, self.name)
 
         if self.vm:
             state = 'present'
@@ -393,7 +431,15 @@ def main():
                               deployment_size=dict(default='small',
                                                    choices=['small', 'medium', 'large',
                                                             'smallrc', 'largerc', 'xsmall']),
-                              ovftool_path=dict(required=True, type='str'),
+                              ovftool_path=dict(required=False, type='str'),
+                              deploy_method=dict(default='ovftool', choices=['ovftool', 'native']),
+                              max_parallel_uploads=dict(default=4, type='int'),
+                              template_cache=dict(default=False, type='bool'),
+                              verify_manifest=dict(default=False, type='bool'),
+                              hash_cache=dict(default='~/.ansible/ova_hash_cache.json', type='str'),
+                              upload_slot_dir=dict(required=False, type='str'),
+                              upload_slots=dict(default=1, type='int'),
+                              upload_rate_limit=dict(default=0, type='int'),
                               path_to_ova=dict(required=True, type='str'),
                               ova_file=dict(required=True, type='str'),
                               state=dict(default='present', choices=['present', 'absent']),))
@@ -407,12 +453,19 @@ def main():
     if not IMPORTS:
         module.fail_json(msg="Failed to import modules")
 
+    if module.params['deploy_method'] == 'ovftool' and not module.params['ovftool_path']:
+        module.fail_json(msg="ovftool_path is required when deploy_method is ovftool")
+
+    if module.params['template_cache'] and module.params['deploy_method'] != 'native':
+        module.fail_json(msg="template_cache requires deploy_method native")
+
     vrops = VropsDeploy(module)
     vrops.run_state()
 
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -64,6 +64,20 @@ options:
     num_hdd:
         description:
             - The number of hdd disks that should be available for disk group creation
+    max_parallel_hosts:
+        description:
+            - The maximum number of hosts queried at the same time
+        type: int
+        default: 4
+    report:
+        description:
+            - Also return a per host report of eligible disk counts and capacity and the failing hosts
+        type: bool
+        default: False
+    report_file:
+        description:
+            - Path to write the report to as json, implies report. The module reports a
+              change when the file is created or its content changes
     state:
         choices: ['present', 'absent']
         required: True
@@ -96,7 +110,21 @@ EXAMPLE = '''
     - vsan_disk_check
 '''
 
+RETURN = '''
+result:
+  description: True if every host has the specified number of eligible disks
+  type: bool
+report:
+  description: with report, eligible disk counts and capacity per host and the failing hosts
+  returned: report
+  type: dict
+  sample: "{'hosts': {'esx01': {'ssd': 2, 'hdd': 6, 'ssd_capacity_gb': 745.2, 'hdd_capacity_gb': 5589.0, 'pass': True}},
+            'failed_hosts': []}"
+'''
+
 try:
+    import json
+    import os
     from pyVmomi import vim, vmodl
     import collections
     HAS_PYVMOMI = True
@@ -107,26 +135,35 @@ except ImportError:
 vc = {}
 
 
-def check_hosts_disks(host):
-
-    vsan_mgr = host.configManager.vsanSystem
-    disks = host.config.storageDevice.scsiLun
-
+def eligible_disks(module, host):
     ssd = []
     hdd =[]
 
-    for disk in disks:
-        check_eligible = vsan_mgr.QueryDisksForVsan(disk.canonicalName)
+    for d in query_hosts_vsan_disks([host], vc['host_disk_results'], module.params['max_parallel_hosts'])[0]:
+        if d.state == 'eligible' and d.disk.ssd:
+            ssd.append(d.disk)
+        if d.state == 'eligible' and (not d.disk.ssd):
+            hdd.append(d.disk)
 
-        for d in check_eligible:
-            if d.state == 'eligible' and d.disk.ssd:
-                ssd.append(d.disk.canonicalName)
-            if d.state == 'eligible' and (not d.disk.ssd):
-                hdd.append(d.disk.canonicalName)
-    
     return ssd, hdd
 
 
+def disks_capacity_gb(disks):
+    capacity = sum(d.capacity.block * d.capacity.blockSize for d in disks)
+    return round(capacity / float(1024 ** 3), 1)
+
+
+def host_disk_report(module, host):
+    ssd, hdd = eligible_disks(module, host)
+
+    return {
+        'ssd': len(ssd),
+        'hdd': len(hdd),
+        'ssd_capacity_gb': disks_capacity_gb(ssd),
+        'hdd_capacity_gb': disks_capacity_gb(hdd),
+    }
+
+
 def state_exit_unchanged(module):
     module.exit_json(changed=False, msg="EXIT UNCHANGED")
 
@@ -138,36 +175,62 @@ def state_delete(module):
 def state_create(module):
     state = False
     results = []
+    report = {'hosts': {}, 'failed_hosts': []}
 
     num_ssd = module.params['num_ssd']
     num_hdd = module.params['num_hdd']
 
+    query_hosts_vsan_disks(vc['hosts'], vc['host_disk_results'], module.params['max_parallel_hosts'])
+
     for h in vc['hosts']:
-        ssd, hdd = check_hosts_disks(h)
+        host_report = host_disk_report(module, h)
+        host_pass = (host_report['ssd'] >= num_ssd) and (host_report['hdd'] >= num_hdd * num_ssd)
 
-        if (len(ssd) >= num_ssd) and (len(hdd) >= num_hdd * num_ssd):
-            results.append(True)
-        else:
-            results.append(False)
+        results.append(host_pass)
+
+        host_report.update({'pass': host_pass})
+        report['hosts'].update({h.name: host_report})
+        if not host_pass:
+            report['failed_hosts'].append(h.name)
 
     if False not in results:
         state = True
 
-    module.exit_json(changed=False, result=state)
+    if not (module.params['report'] or module.params['report_file']):
+        module.exit_json(changed=False, result=state)
+
+    changed = False
+
+    if module.params['report_file']:
+        report_json = json.dumps(report, indent=2, sort_keys=True)
+        try:
+            current = None
+            if os.path.isfile(module.params['report_file']):
+                with open(module.params['report_file']) as f:
+                    current = f.read()
+            if current != report_json:
+                with open(module.params['report_file'], 'w') as f:
+                    f.write(report_json)
+                changed = True
+        except IOError as e:
+            module.fail_json(msg="Failed to write report: {}".format(e))
+
+    module.exit_json(changed=changed, result=state, report=report)
 
 
 def check_vsan_state(module):
 
-    content = connect_to_api(module)
+    content = connect_to_api_cached(module)
 
-    dc = find_datacenter_by_name(content, module.params['datacenter_name'])
+    dc = find_vcenter_object_by_name(content, vim.Datacenter, module.params['datacenter_name'])
 
     if not dc:
         module.fail_json(msg="Failed to get datacenter")
 
     vc['dc'] = dc
 
-    cluster = find_cluster_by_name_datacenter(dc, module.params['cluster_name'])
+    cluster = find_vcenter_object_by_name(content, vim.ClusterComputeResource, module.params['cluster_name'],
+                                          dc.hostFolder)
 
     if not cluster:
         module.fail_json(msg="Failed to get cluster")
@@ -178,6 +241,7 @@ def check_vsan_state(module):
         module.fail_json(msg="No hosts in cluster")
 
     vc['hosts'] = cluster.host
+    vc['host_disk_results'] = {}
 
     return 'absent'
 
@@ -191,6 +255,9 @@ def main():
             cluster_name=dict(required=True, type='str'),
             num_ssd=dict(required=True, type='int'),
             num_hdd=dict(required=True, type='int'),
+            max_parallel_hosts=dict(default=4, type='int'),
+            report=dict(default=False, type='bool'),
+            report_file=dict(type='path'),
             state=dict(default='present', choices=['present', 'absent'], type='str'),
         )
     )
@@ -219,6 +286,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -68,8 +68,21 @@ options:
                 per host since 1 ssd per diskgroup for cache tier is needed
             - num_disks_per_group:
                 The number of hdd disks per disk group.
+            - Capacity disks are spread over the disk groups so that each group has about
+              the same capacity, the planned groups are returned in check mode.
         type: dict
         required: True
+    max_parallel_hosts:
+        description:
+            - The maximum number of hosts with a vsan task in flight at the same time
+        type: int
+        default: 4
+    decommission_mode:
+        description:
+            - vsan data evacuation used when removing disk groups with state absent,
+              noAction skips evacuation which is much faster for lab teardown.
+              Defaults to the vCenter default when not set
+        choices: ['ensureObjectAccessibility', 'evacuateAllData', 'noAction']
     state:
         description:
             - Desired state of the disk group
@@ -98,8 +111,6 @@ EXAMPLE = '''
 '''
 
 
-
-
 try:
     from pyVim import vim, vmodl
     HAS_PYVMOMI = True
@@ -120,10 +131,12 @@ class VsanHybridDiskgroup(object):
         self.datacenter = None
         self.host_list = None
         self.host_vsan_vmk = None
-        self.content = connect_to_api(module)
+        self.content = connect_to_api_cached(module)
         self.host_disk_profile = module.params['host_disk_profile']
         self.host_disk_ssd = int(module.params['host_disk_profile']['num_disk_groups'])
         self.host_disk_hdd_group = int(module.params['host_disk_profile']['num_disks_per_group'])
+        self.max_parallel_hosts = max(1, module.params['max_parallel_hosts'])
+        self.host_disk_results = {}
 
 
     def _fail(self, fail_msg):
@@ -163,6 +176,10 @@ class VsanHybridDiskgroup(object):
         :return:
         '''
         hosts_results = {}
+        mcast_specs = {}
+        disk_plans = {}
+
+        query_hosts_vsan_disks(self.host_list, self.host_disk_results, self.max_parallel_hosts)
 
         for host in self.host_list:
 
@@ -176,14 +193,43 @@ class VsanHybridDiskgroup(object):
             if not host_vmks:
                 self.module.fail_json(msg="No valid vmks found")
 
-            mcast_spec = self.vsan_host_configinfo_mcast_spec(host_vmks)
-            changed, result = self.vsan_host_update_multicast(host, mcast_spec)
-            hosts_results[host.name].update({'mcast_spec_update': changed})
+            mcast_specs[host.name] = self.vsan_host_configinfo_mcast_spec(host_vmks)
+
+            disk_plans[host.name] = self.vsan_host_disk_mapping_plan(host, 'eligible')
+            hosts_results[host.name].update({'disk_group_plan': self.vsan_disk_mapping_plan_result(disk_plans[host.name])})
+
+        if self.module.check_mode:
+            self.module.exit_json(changed=True, result=hosts_results, msg='CREATE')
 
-            initialize_disk_spec = self.vsan_host_disk_mapping_spec(host, 'eligible')
-            changed, result = self.vsan_create_disk_group(host, initialize_disk_spec)
-            hosts_results[host.name].update({'create_disk_groups': [changed]})
+        mcast_results = run_host_tasks(
+            self.module, self.content, self.host_list,
+            lambda h: h.configManager.vsanSystem.UpdateVsan_Task(mcast_specs[h.name]),
+            self.max_parallel_hosts
+        )
+
+        for host in self.host_list:
+            hosts_results[host.name].update({'mcast_spec_update': mcast_results[host.name]['changed']})
+
+        failed = [name for name, r in mcast_results.items() if not r['changed']]
+        if failed:
+            self.module.fail_json(msg="Failed to update multicast on: {}".format(', '.join(failed)),
+                                  changed=any(r['changed'] for r in mcast_results.values()),
+                                  result=hosts_results, mcast_results=mcast_results)
+
+        create_results = run_host_tasks(
+            self.module, self.content, self.host_list,
+            lambda h: h.configManager.vsanSystem.InitializeDisks_Task(self.vsan_disk_mapping_specs(disk_plans[h.name])),
+            self.max_parallel_hosts
+        )
+
+        for host in self.host_list:
+            hosts_results[host.name].update({'create_disk_groups': [create_results[host.name]['changed']]})
+            hosts_results[host.name].update({'create_disk_groups_duration': create_results[host.name]['duration']})
 
+        failed = [name for name, r in create_results.items() if not r['changed']]
+        if failed:
+            self.module.fail_json(msg="Failed to create disk groups on: {}".format(', '.join(failed)),
+                                  changed=True, result=hosts_results, create_results=create_results)
 
         self.module.exit_json(changed=True, result=hosts_results, msg='CREATE')
 
@@ -193,23 +239,45 @@ class VsanHybridDiskgroup(object):
         Destroys diskgroups
         :return:
         '''
-        #inverse of hostlist
+        disk_mappings = {}
 
-        hosts = [h for h in self.cluster.host]
-        disk_state = 'inUse'
+        for host in self.cluster.host:
+            mappings = host.config.vsanHostConfig.storageInfo.diskMapping
+            if mappings:
+                disk_mappings[host.name] = (host, mappings)
 
-        host_results = {}
+        hosts = [mapped_host for mapped_host, host_mappings in disk_mappings.values()]
 
-        for host in hosts:
-            host_results.update({host.name: {}})
-            disk_specs = self.vsan_host_disk_mapping_spec(host, disk_state)
+        if self.module.check_mode:
+            host_results = dict((name, {'disk_groups': [m.ssd.canonicalName for m in mappings]})
+                                for name, (host, mappings) in disk_mappings.items())
+            self.module.exit_json(changed=True, result=host_results, msg='DESTROY')
 
-            remove_task = self.vsan_delete_disk_group(host, disk_specs)
-            #changed, result = wait_for_task(remove_task)
+        maintenance_spec = None
+        decommission_mode = self.module.params['decommission_mode']
 
-            #host_results[host.name].update({'changed': changed})
+        if decommission_mode:
+            maintenance_spec = vim.host.MaintenanceSpec(
+                vsanMode=vim.vsan.host.DecommissionMode(objectAction=decommission_mode)
+            )
+
+        host_results = run_host_tasks(
+            self.module, self.content, hosts,
+            lambda h: h.configManager.vsanSystem.RemoveDiskMapping_Task(
+                mapping=disk_mappings[h.name][1],
+                maintenanceSpec=maintenance_spec
+            ),
+            self.max_parallel_hosts
+        )
 
-        self.module.exit_json(changed=True, result=host_results, msg='DESTROY')
+        changed = any(r['changed'] for r in host_results.values())
+        failed = [name for name, r in host_results.items() if not r['changed']]
+
+        if failed:
+            self.module.fail_json(msg="Failed to remove disk groups on: {}".format(', '.join(failed)),
+                                  result=host_results)
+
+        self.module.exit_json(changed=changed, result=host_results, msg='DESTROY')
 
 
     def state_update_diskgroup(self):
@@ -233,12 +301,13 @@ class VsanHybridDiskgroup(object):
         state = 'absent'
 
         try:
-            self.datacenter = find_datacenter_by_name(self.content, self.datacenter_name)
+            self.datacenter = find_vcenter_object_by_name(self.content, vim.Datacenter, self.datacenter_name)
 
             if not self.datacenter:
                 self.module.fail_json(msg="Cannot find DC")
 
-            self.cluster = find_cluster_by_name_datacenter(self.datacenter, self.cluster_name)
+            self.cluster = find_vcenter_object_by_name(self.content, vim.ClusterComputeResource, self.cluster_name,
+                                                       self.datacenter.hostFolder)
 
             if not self.cluster:
                 self.module.fail_json(msg="Cannot find cluster")
@@ -310,22 +379,6 @@ class VsanHybridDiskgroup(object):
         return config_info
 
 
-    def vsan_host_update_multicast(self, host, spec):
-
-        changed = False
-        result = None
-
-        vsan_manager = host.configManager.vsanSystem
-
-        try:
-            update_mcast = vsan_manager.UpdateVsan_Task(spec)
-            changed, result = wait_for_task(update_mcast)
-        except Exception:
-            pass
-
-        return changed, result
-
-
     def vsan_host_check_disk_profile(self, host):
         '''
         Returns bool, true if eligible disks meet desired self.host_disk_profile
@@ -351,82 +404,75 @@ class VsanHybridDiskgroup(object):
         :param state: eligible, ineligible, inUse
         :return: dict, host_vsan_info
         '''
-
-        disks = host.config.storageDevice.scsiLun
-        vsan_mgr = host.configManager.vsanSystem
+        disk_results = query_hosts_vsan_disks([host], self.host_disk_results, self.max_parallel_hosts)[0]
 
         host_vsan_info = {'name': host.name, 'ssd': [], 'hdd': []}
 
-        for disk in disks:
-            eligible_disks = vsan_mgr.QueryDisksForVsan(disk.canonicalName)
-
-            for d in eligible_disks:
-                if d.state == state and d.disk.ssd:
-                    host_vsan_info['ssd'].append(d.disk)
-                if d.state == state and (not d.disk.ssd):
-                    host_vsan_info['hdd'].append(d.disk)
+        for d in disk_results:
+            if d.state == state and d.disk.ssd:
+                host_vsan_info['ssd'].append(d.disk)
+            if d.state == state and (not d.disk.ssd):
+                host_vsan_info['hdd'].append(d.disk)
 
         return host_vsan_info
 
 
-    def vsan_host_disk_mapping_spec(self, host, disk_state):
-
-        disk_info = self.vsan_host_disk_state(host, disk_state)
-        ssd = disk_info['ssd']
-        hdd = disk_info['hdd']
-
-        hdd_progress = {}
-        for h in hdd:
-            hdd_progress.update({h:'available'})
-
-        init_disk_specs = {}
-
-        for i in range(len(ssd)):
-            init_disk_specs[i] = vim.vsan.host.DiskMapping()
-            init_disk_specs[i].ssd = ssd[i]
-
-            for x, item in enumerate(hdd):
-                if hdd_progress[item] == 'available':
-                    init_disk_specs[i].nonSsd.append(item)
-                    hdd_progress[item] = 'used'
-                if len(init_disk_specs[i].nonSsd) == self.host_disk_hdd_group:
-                    break
-
-        specs = [v for k, v in init_disk_specs.items()]
+    def disk_capacity(self, disk):
+        '''
+        Returns the capacity of a vim.host.ScsiDisk() in bytes
+        '''
+        return disk.capacity.block * disk.capacity.blockSize
 
-        return specs
 
+    def vsan_host_disk_mapping_plan(self, host, disk_state):
+        '''
+        Plans num_disk_groups disk groups of one ssd and num_disks_per_group hdds.
+        Hdds are placed largest first into the open group with the least capacity
+        so far, which keeps capacity balanced across groups, and the largest ssds
+        are paired with the largest groups
+        :param host: vim.HostSystem()
+        :param disk_state: eligible, ineligible, inUse
+        :return: list of (ssd, [hdd]) tuples
+        '''
+        disk_info = self.vsan_host_disk_state(host, disk_state)
+        ssd = sorted(disk_info['ssd'], key=self.disk_capacity, reverse=True)[:self.host_disk_ssd]
+        hdd = sorted(disk_info['hdd'], key=self.disk_capacity, reverse=True)
 
-    def vsan_create_disk_group(self, host, spec_list):
+        groups = [[] for _ in ssd]
+        group_capacity = [0 for _ in ssd]
 
-        changed = False
-        result = None
+        for disk in hdd:
+            open_groups = [i for i, g in enumerate(groups) if len(g) < self.host_disk_hdd_group]
 
-        vsan_mgr = host.configManager.vsanSystem
+            if not open_groups:
+                break
 
-        try:
-            init_disks_task = vsan_mgr.InitializeDisks_Task(spec_list)
-            changed, result = wait_for_task(init_disks_task)
-        except Exception:
-            pass
+            smallest = min(open_groups, key=lambda i: group_capacity[i])
+            groups[smallest].append(disk)
+            group_capacity[smallest] += self.disk_capacity(disk)
 
-        return changed, result
+        by_capacity = sorted(range(len(groups)), key=lambda i: group_capacity[i], reverse=True)
 
+        return [(ssd[n], groups[i]) for n, i in enumerate(by_capacity)]
 
-    def vsan_delete_disk_group(self, host, spec_list):
-        changed = False
-        result = None
 
-        vsan_mgr = host.configManager.vsanSystem
+    def vsan_disk_mapping_plan_result(self, plan):
+        '''
+        Returns the plan as a list of dicts for module results
+        '''
+        gb = 1024 ** 3
 
-        try:
-            delete_disks_task = vsan_mgr.RemoveDiskMapping_Task(spec_list)
-            changed, result = wait_for_task(delete_disks_task)
-        except Exception:
-            pass
+        return [{'ssd': ssd.canonicalName,
+                 'hdd': [h.canonicalName for h in hdd],
+                 'capacity_gb': round(sum(self.disk_capacity(h) for h in hdd) / float(gb), 1)}
+                for ssd, hdd in plan]
 
-        return changed, result
 
+    def vsan_disk_mapping_specs(self, plan):
+        '''
+        Returns list of vim.vsan.host.DiskMapping() for a disk mapping plan
+        '''
+        return [vim.vsan.host.DiskMapping(ssd=ssd, nonSsd=hdd) for ssd, hdd in plan]
 
 
 def main():
@@ -437,11 +483,13 @@ def main():
             datacenter_name=dict(required=True, type='str'),
             cluster_name=dict(required=True, type='str'),
             host_disk_profile=dict(type='dict'),
+            max_parallel_hosts=dict(default=4, type='int'),
+            decommission_mode=dict(choices=['ensureObjectAccessibility', 'evacuateAllData', 'noAction'], type='str'),
             state=dict(default='present', choices=['present', 'absent'], type='str'),
         )
     )
 
-    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
 
     if not HAS_PYVMOMI:
         module.fail_json(msg='pyvmomi is required for this module')
@@ -451,6 +499,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
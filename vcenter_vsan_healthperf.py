@@ -143,12 +143,13 @@ class VsanHealthPerf(object):
         self.vc_mos = GetVsanVcMos(self.si._stub, context=None)
 
         try:
-            self.datacenter = find_datacenter_by_name(self.content, self.datacenter_name)
+            self.datacenter = find_vcenter_object_by_name(self.content, vim.Datacenter, self.datacenter_name)
 
             if not self.datacenter:
                 self.module.fail_json(msg="Cannot find DC")
 
-            self.cluster = find_cluster_by_name_datacenter(self.datacenter, self.cluster_name)
+            self.cluster = find_vcenter_object_by_name(self.content, vim.ClusterComputeResource, self.cluster_name,
+                                                       self.datacenter.hostFolder)
 
             if not self.cluster:
                 self.module.fail_json(msg="Cannot find cluster")
@@ -219,6 +220,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 from ansible.module_utils.vsanapiutils import *
 from ansible.module_utils.vsanmgmtObjects import *
 
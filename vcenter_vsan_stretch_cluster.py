@@ -208,17 +208,18 @@ class VsanStretchCluster(object):
             self.vMos = GetVsanVcMos(self.si._stub, None)
             self.vsan_sc_system = self.vMos['vsan-stretched-cluster-system']
 
-            self.datacenter = find_datacenter_by_name(self.content, self.datacenter_name)
+            self.datacenter = find_vcenter_object_by_name(self.content, vim.Datacenter, self.datacenter_name)
 
             if not self.datacenter:
                 self.module.fail_json(msg="Cannot find DC")
 
-            self.cluster = find_cluster_by_name_datacenter(self.datacenter, self.cluster_name)
+            self.cluster = find_vcenter_object_by_name(self.content, vim.ClusterComputeResource, self.cluster_name,
+                                                       self.datacenter.hostFolder)
 
             if not self.cluster:
                 self.module.fail_json(msg="Cannot find cluster")
 
-            witness_host = find_hostsystem_by_name(self.content, self.witness_host_name)
+            witness_host = find_vcenter_object_by_name(self.content, vim.HostSystem, self.witness_host_name)
 
             if not witness_host:
                 self.module.fail_json(msg="Cannot find witness host")
@@ -284,19 +285,16 @@ class VsanStretchCluster(object):
 
         '''
 
-        disks = host.config.storageDevice.scsiLun
         vsan_mgr = host.configManager.vsanSystem
 
         host_vsan_info = {'name': host.name, 'ssd': [], 'hdd': []}
 
-        for disk in disks:
-            eligible_disks = vsan_mgr.QueryDisksForVsan(disk.canonicalName)
-
-            for d in eligible_disks:
-                if d.state == state and d.disk.ssd:
-                    host_vsan_info['ssd'].append(d.disk)
-                if d.state == state and (not d.disk.ssd):
-                    host_vsan_info['hdd'].append(d.disk)
+        # without a canonical name list the query returns every disk on the host
+        for d in vsan_mgr.QueryDisksForVsan():
+            if d.state == state and d.disk.ssd:
+                host_vsan_info['ssd'].append(d.disk)
+            if d.state == state and (not d.disk.ssd):
+                host_vsan_info['hdd'].append(d.disk)
 
         return host_vsan_info
 
@@ -357,6 +355,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 from ansible.module_utils.vsanapiutils import *
 from ansible.module_utils.vsanmgmtObjects import *
 
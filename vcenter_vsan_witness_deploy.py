@@ -59,8 +59,46 @@ options:
         required: True
     ovftool_path:
         description:
-            - The path where the ovftool is installed
+            - The path where the ovftool is installed, required when deploy_method is ovftool
         ex: /usr/local/bin/ovftool
+    deploy_method:
+        description:
+            - ovftool runs the ovftool binary, native imports the ova through the vSphere api
+              and streams its disks to vcenter without extracting the ova
+        choices: ['ovftool', 'native']
+        default: ovftool
+    max_parallel_uploads:
+        description:
+            - Number of disks uploaded at the same time when deploy_method is native
+        default: 4
+    template_cache:
+        description:
+            - Keep the imported ova as a template named after its sha256 and clone new
+              appliances from it, only the first deploy of an ova uploads its disks.
+              Requires deploy_method native
+        default: False
+    verify_manifest:
+        description:
+            - Check the files of the ova against its manifest before deploying, an ova
+              without a manifest is deployed with a warning
+        default: False
+    hash_cache:
+        description:
+            - File recording verified ovas and their sha256 by path, size and mtime, so an
+              unchanged ova is only hashed once
+        default: ~/.ansible/ova_hash_cache.json
+    upload_slot_dir:
+        description:
+            - Directory of lock files shared by deploys running at the same time, at most
+              upload_slots of them upload to the same datastore at once
+    upload_slots:
+        description:
+            - Number of deploys sharing upload_slot_dir that may upload to one datastore at once
+        default: 1
+    upload_rate_limit:
+        description:
+            - Upper bound for the upload rate of this deploy in MB/s, 0 for no limit
+        default: 0
     path_to_ova:
         description:
             - The path where the witness appliance ova is located
@@ -142,7 +180,6 @@ try:
     import json
     import os
     import requests
-    import time
     from pyVmomi import vim, vmodl
     IMPORTS = True
 except ImportError:
@@ -154,47 +191,14 @@ class TaskError(Exception):
 
 vc = {}
 
-def wait_for_vm(vm):
-    while True:
-
-        if vm.runtime.powerState == 'poweredOn' and vm.runtime.connectionState == 'connected':
-            return True
-        if vm.runtime.connectionState in ('inaccessible', 'invalid', 'orphaned') or \
-                vm.rumtime.powerState == 'suspended':
-            try:
-                raise TaskError("VM in Error State")
-            except TaskError as e:
-                return e
-
-        time.sleep(15)
-
-
 def find_virtual_machine(content, searched_vm_name):
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
-    for vm in virtual_machines:
-        if vm.name == searched_vm_name:
+    virtual_machines = get_all_objs_props(content, [vim.VirtualMachine])
+    for vm, vm_props in virtual_machines.items():
+        if vm_props['name'] == searched_vm_name:
             return vm
     return None
 
 
-def get_all_objs(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    return obj
-
-
-def find_vcenter_object_by_name(content, vimtype, name):
-    objts = get_all_objs(content, [vimtype])
-
-    for objt in objts:
-        if objt.name == name:
-            return objt
-
-    return None
-
-
 def state_delete_vm(module):
 
     changed = False
@@ -214,11 +218,16 @@ def state_delete_vm(module):
     module.exit_json(changed=changed)
 
 
-
 def state_exit_unchanged(module):
     module.exit_json(changed=False, msg="EXIT UNCHANED")
 
 
+def ova_properties(module):
+    return {
+        'vsan.witness.root.passwd': module.params['root_password'],
+    }
+
+
 def ova_tool_command_list(module, ovftool_exec, ova_file, vi_string, proxy=None):
     ova_command_list = [ovftool_exec,
                         '--acceptAllEulas',
@@ -231,8 +240,9 @@ def ova_tool_command_list(module, ovftool_exec, ova_file, vi_string, proxy=None)
                         '--datastore={}'.format(module.params['datastore']),
                         '--net:Management Network={}'.format(module.params['management_network']),
                         '--net:Witness Network={}'.format(module.params['vsan_network']),
-                        '--deploymentOption={}'.format(module.params['deployment_size']),
-                        '--prop:vsan.witness.root.passwd={}'.format(module.params['root_password'])]
+                        '--deploymentOption={}'.format(module.params['deployment_size'])]
+
+    ova_command_list += ['--prop:{}={}'.format(k, v) for k, v in ova_properties(module).items()]
 
     if proxy:
         ova_command_list.append('--proxy={}'.format(proxy))
@@ -243,8 +253,42 @@ def ova_tool_command_list(module, ovftool_exec, ova_file, vi_string, proxy=None)
     return ova_command_list
 
 
+def state_create_vm_native(module):
+    ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
+    networks = {
+        'Management Network': module.params['management_network'],
+        'Witness Network': module.params['vsan_network'],
+    }
+
+    deployer = OvaDeployer(module, vc['content'], ova_file, module.params['max_parallel_uploads'],
+                           proxy=module.params['proxy'], hash_cache=module.params['hash_cache'],
+                           upload_slot_dir=module.params['upload_slot_dir'],
+                           upload_slots=module.params['upload_slots'],
+                           upload_rate_limit=module.params['upload_rate_limit'] * 1024 * 1024)
+    deploy = deployer.deploy_cached if module.params['template_cache'] else deployer.deploy
+    result = deploy(module.params['datacenter'], module.params['cluster'],
+                    module.params['datastore'], module.params['vmname'],
+                    module.params['disk_mode'], networks,
+                    ova_properties(module), module.params['deployment_size'])
+
+    module.exit_json(changed=True, result=result, manifest=vc.get('manifest'))
+
+
+def verify_ova_manifest(module):
+    ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
+
+    deployer = OvaDeployer(module, vc['content'], ova_file, hash_cache=module.params['hash_cache'])
+    vc['manifest'] = deployer.verify_manifest()
+
+
 def state_create_vm(module):
 
+    if module.params['verify_manifest']:
+        verify_ova_manifest(module)
+
+    if module.params['deploy_method'] == 'native':
+        state_create_vm_native(module)
+
     ovftool_exec = '{}/ovftool'.format(module.params['ovftool_path'])
     ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
     vi_string = 'vi://{}:{}@{}/{}/host/{}/'.format(module.params['username'],
@@ -258,8 +302,7 @@ def state_create_vm(module):
     if ova_tool_result[0] != 0:
         module.fail_json(msg='Failed to deploy OVA, error message from ovftool is: {}'.format(ova_tool_result[1]))
 
-    module.exit_json(changed=True, result=ova_tool_result[0])
-
+    module.exit_json(changed=True, result=ova_tool_result[0], manifest=vc.get('manifest'))
 
 
 def main():
@@ -268,7 +311,15 @@ def main():
     argument_spec.update(
         dict(
             vmname=dict(required=True, type='str'),
-            ovftool_path=dict(required=True, type='str'),
+            ovftool_path=dict(required=False, type='str'),
+            deploy_method=dict(default='ovftool', choices=['ovftool', 'native']),
+            max_parallel_uploads=dict(default=4, type='int'),
+            template_cache=dict(default=False, type='bool'),
+            verify_manifest=dict(default=False, type='bool'),
+            hash_cache=dict(default='~/.ansible/ova_hash_cache.json', type='str'),
+            upload_slot_dir=dict(required=False, type='str'),
+            upload_slots=dict(default=1, type='int'),
+            upload_rate_limit=dict(default=0, type='int'),
             path_to_ova=dict(required=True, type='str'),
             ova_file=dict(required=True, type='str'),
             datacenter=dict(required=True, type='str'),
@@ -277,7 +328,7 @@ def main():
             datastore=dict(required=True, type='str'),
             management_network=dict(required=True, type='str'),
             vsan_network=dict(required=True, type='str'),
-            root_password=dict(required=True, type='str'),
+            root_password=dict(required=True, type='str', no_log=True),
             deployment_size=dict(required=True, choices=['tiny', 'normal', 'large']),
             proxy=dict(require=False, type='str'),
             state=dict(default='present', choices=['present', 'absent']),
@@ -289,7 +340,14 @@ def main():
     if not IMPORTS:
         module.fail_json(msg="Failed to import modules")
 
-    content = connect_to_api(module)
+    if module.params['deploy_method'] == 'ovftool' and not module.params['ovftool_path']:
+        module.fail_json(msg="ovftool_path is required when deploy_method is ovftool")
+
+    if module.params['template_cache'] and module.params['deploy_method'] != 'native':
+        module.fail_json(msg="template_cache requires deploy_method native")
+
+    content = connect_to_api_cached(module)
+    vc['content'] = content
 
     witness_appliance = find_virtual_machine(content, module.params['vmname'])
 
@@ -318,6 +376,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -75,31 +75,13 @@ EXAMPLES = '''
 '''
 
 try:
-    from pyVmomi import vim, vmodl
     from pyVim import connect
+    from pyVmomi import vim, vmodl
     HAS_PYVMOMI = True
 except ImportError:
     HAS_PYVMOMI = False
 
 
-def find_vcenter_object_by_name(content, vimtype, object_name):
-    vcenter_object = get_all_objs(content, [vimtype])
-
-    for k, v in vcenter_object.items():
-        if v == object_name:
-            return k
-    else:
-        return None
-
-
-def find_vds_by_name(content, vds_name):
-    vdSwitches = get_all_objs(content, [vim.dvs.VmwareDistributedVirtualSwitch])
-    for vds in vdSwitches:
-        if vds_name == vds.name:
-            return vds
-    return None
-
-
 def _create_vds_spec(si, update, module):
 
     vds_name = module.params['vds_name']
@@ -140,7 +122,7 @@ def _create_vds_spec(si, update, module):
     )
 
     if update:
-        vds = find_vds_by_name(si, vds_name)
+        vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
         configSpec.configVersion = vds.config.configVersion
         return configSpec
 
@@ -181,7 +163,7 @@ def _check_vds_config_spec(vds, module):
 def state_update_vds(si, module):
 
     vds_name = module.params['vds_name']
-    vds = vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     config_spec = _create_vds_spec(si, True, module)
 
@@ -201,7 +183,7 @@ def state_exit_unchanged(si, module):
 def state_destroy_vds(si, module):
 
     vds_name = module.params['vds_name']
-    vds = find_vds_by_name(si, vds_name)
+    vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
     if vds is None:
         module.exit_json(msg="Could not find vds: {}".format(vds_name))
@@ -217,7 +199,7 @@ def state_destroy_vds(si, module):
 
 def state_create_vds(si, module):
 
-    datacenter = find_datacenter_by_name(si, module.params['datacenter_name'])
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, module.params['datacenter_name'])
     network_folder = datacenter.networkFolder
 
     vds_create_spec = _create_vds_spec(si, False, module)
@@ -239,7 +221,7 @@ def check_vds_state(si, module):
     vds_name = module.params['vds_name']
 
     try:
-        vds = find_vds_by_name(si, vds_name)
+        vds = find_vcenter_object_by_name(si, vim.DistributedVirtualSwitch, vds_name)
 
         if vds is None:
             return 'absent'
@@ -288,9 +270,9 @@ def main():
         }
     }
 
-    si = connect_to_api(module)
+    si = connect_to_api_cached(module)
 
-    datacenter = find_datacenter_by_name(si, module.params['datacenter_name'])
+    datacenter = find_vcenter_object_by_name(si, vim.Datacenter, module.params['datacenter_name'])
 
     if datacenter is None:
         module.fail_json(msg="Could not find datacenter: {}".format(module.params['datacenter_name']))
@@ -303,6 +285,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -64,6 +64,48 @@ options:
             - Name for the vio cluster
         required: True
         type: str
+    datastore_placement:
+        description:
+            - How the management nodes are spread over vio_mgmt_datastores. round_robin
+              takes the datastores in turn, capacity puts every node on the datastore with
+              the most free space as reported by vcenter_hostname and fails when a node
+              does not fit
+        choices: round_robin, capacity
+        default: round_robin
+        type: str
+    vcenter_hostname:
+        description:
+            - vCenter the datastore free space is read from, with login and password.
+              Required for datastore_placement capacity
+        type: str
+    validate_certs:
+        description:
+            - Validate the certificate of vcenter_hostname
+        default: True
+        type: bool
+    node_disk_size:
+        description:
+            - GB a management node takes on its datastore, for datastore_placement capacity.
+              Used for the plan nodes that give neither a diskSize or disk of their own nor
+              a disk in their flavor
+        default: 80
+        type: int
+    datastore_reserve:
+        description:
+            - GB kept free on every datastore, for datastore_placement capacity
+        default: 20
+        type: int
+    wait:
+        description:
+            - Wait for the deployment task until the cluster is RUNNING, fails on
+              PROVISION_ERROR or a failed task. Node progress is logged to the module log
+        default: False
+        type: bool
+    wait_timeout:
+        description:
+            - Seconds to wait for the deployment
+        default: 7200
+        type: int
     state:
         description:
             - desired state of the vio cluster
@@ -82,6 +124,8 @@ EXAMPLE = '''
     cluster_spec_json: "{{ vio_cluster_spec }}"
     vio_mgmt_datastores: "{{ vio_mgmt_node_datastores }}"
     vio_deployment_name: "{{ vio_cluster_name }}"
+    datastore_placement: capacity
+    vcenter_hostname: "{{ vcenter }}"
     state: "{{ desired_state }}"
   tags:
     - vio_cluster
@@ -89,15 +133,26 @@ EXAMPLE = '''
 
 try:
     import json
+    import hashlib
     import os
     import logging
     import requests
     import inspect
     import collections
+    import random
+    import ssl
+    import time
     IMPORTS = True
 except ImportError:
     IMPORTS = False
 
+try:
+    from pyVim.connect import SmartConnect, Disconnect
+    from pyVmomi import vim, vmodl
+    HAS_PYVMOMI = True
+except ImportError:
+    HAS_PYVMOMI = False
+
 LOG = logging.getLogger(__name__)
 handler = logging.FileHandler('/var/log/chaperone/vio_cluster_deploy.log')
 formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
@@ -105,27 +160,49 @@ handler.setFormatter(formatter)
 LOG.addHandler(handler)
 LOG.setLevel(logging.DEBUG)
 
+class RestClientError(Exception):
+    pass
+
+
 class RestClient(object):
     """OMS RestClient
 
     This is the client implementation based on "requests".
+    All requests share one pooled session, the client logs in again when
+    the OMS session expired and retries idempotent requests on connection
+    errors and 502/503/504 with exponential backoff.
     """
     _URL_TEMPLATE_PREFIX = "https://%s:8443/oms/%s"
+    _IDEMPOTENT_METHODS = ['GET', 'HEAD', 'PUT', 'DELETE']
+    _RETRY_STATUS_CODES = [502, 503, 504]
 
-    def __init__(self, server, username, password):
+    def __init__(self, server, username, password, pool_maxsize=4, max_retries=4,
+                 backoff=1.0, timeout=(10, 300)):
         """Create a connection to the remote OMS server
 
         :param server: IP or hostname of the OMS server
         :param username: User name
         :param password: Password
+        :param pool_maxsize: connections kept open to the OMS server
+        :param max_retries: retries of idempotent requests
+        :param backoff: seconds before the first retry, doubled each retry
+        :param timeout: connect and read timeout in seconds
         :return: None
         """
         self._server = server
         self._username = username
         self._password = password
-
-        # TODO Do we need to have logout logic?
-        self._session = self._login()
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self.stats = {}
+
+        self._session = requests.Session()
+        self._session.verify = False
+        self._session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1,
+                                                                      pool_maxsize=pool_maxsize,
+                                                                      max_retries=0))
+        self._login()
 
     def _api_url(self, path):
         api_url_template = "api/%s"
@@ -133,57 +210,119 @@ class RestClient(object):
         return self._URL_TEMPLATE_PREFIX % (self._server, api_path)
 
     def _login_url(self):
-        login_url_template = \
-            "j_spring_security_check?j_username=%s&j_password=%s"
-        login_url = login_url_template % (self._username, self._password)
-        return self._URL_TEMPLATE_PREFIX % (self._server, login_url)
+        return self._URL_TEMPLATE_PREFIX % (self._server, "j_spring_security_check")
+
+    def _login_required(self, response):
+        """True if the OMS session expired and the request was
+        answered with 401 or redirected to the login page
+        """
+        if response.status_code == 401:
+            return True
+        for redirect in [response] + list(response.history):
+            if redirect.status_code in (301, 302, 303) and \
+                    'login' in redirect.headers.get('Location', ''):
+                return True
+        return False
 
     def _login(self):
-        session = requests.Session()
+        self._session.cookies.clear()
 
         LOG.debug("Request login...")
-        response = session.post(self._login_url(), verify=False)
+        try:
+            response = self._session.post(self._login_url(), allow_redirects=False,
+                                          data={'j_username': self._username,
+                                                'j_password': self._password},
+                                          timeout=self._timeout)
+        except requests.RequestException as e:
+            raise RestClientError("Failed to login to OMS {}: {}".format(self._server, e))
         LOG.debug(response)
 
-        return session
+        location = response.headers.get('Location', '')
+        if response.status_code not in (200, 302) or 'error' in location or 'login' in location:
+            raise RestClientError("Failed to login to OMS {} status code: {}".format(self._server,
+                                                                                   response.status_code))
+
+        return self._session
 
     def login(self):
-        self._session = self._login()
+        self._login()
+
+    def _record(self, endpoint, latency, retries, relogins, error):
+        stat = self.stats.setdefault(endpoint, {'count': 0, 'errors': 0, 'retries': 0,
+                                                'relogins': 0, 'total_time': 0.0, 'max_time': 0.0})
+        stat['count'] += 1
+        stat['errors'] += int(error)
+        stat['retries'] += retries
+        stat['relogins'] += relogins
+        stat['total_time'] += latency
+        stat['max_time'] = max(stat['max_time'], latency)
+
+    def report(self):
+        """Returns per endpoint request count, errors, retries, relogins
+        and average and max latency in seconds
+        """
+        report = {}
+        for endpoint, stat in self.stats.items():
+            report[endpoint] = dict(stat, total_time=round(stat['total_time'], 3),
+                                    max_time=round(stat['max_time'], 3),
+                                    avg_time=round(stat['total_time'] / stat['count'], 3))
+        LOG.debug("Requests: %s" % report)
+        return report
+
+    def _request(self, method, path, url, **kwargs):
+        endpoint = "%s %s" % (method, path)
+        kwargs.setdefault('timeout', self._timeout)
+        retries = 0
+        relogins = 0
+        start = time.time()
+
+        while True:
+            LOG.debug("Request %s: %s" % (method, url))
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if method not in self._IDEMPOTENT_METHODS or retries >= self._max_retries:
+                    self._record(endpoint, time.time() - start, retries, relogins, True)
+                    raise RestClientError("Request {} failed: {}".format(endpoint, e))
+                response = None
+            LOG.debug(response)
+
+            if response is not None and self._login_required(response) and not relogins:
+                # the request was rejected before it was handled, safe to send again
+                relogins += 1
+                self._login()
+                continue
+
+            if response is not None and (response.status_code not in self._RETRY_STATUS_CODES or
+                                         method not in self._IDEMPOTENT_METHODS or
+                                         retries >= self._max_retries):
+                break
+
+            sleep = self._backoff * (2 ** retries)
+            retries += 1
+            LOG.debug("Retry %s %s in %.1fs" % (retries, endpoint, sleep))
+            time.sleep(sleep + random.uniform(0, sleep / 2))
+
+        self._record(endpoint, time.time() - start, retries, relogins, response.status_code >= 400)
+        return response
 
-    def do_get(self, path):
+    def do_get(self, path, **kwargs):
         url = self._api_url(path)
-
-        LOG.debug("Request GET: %s" % url)
-        response = self._session.get(url, verify=False)
-        LOG.debug(response)
-
-        return response
+        return self._request('GET', path, url, **kwargs)
 
     def do_delete(self, path, object_id):
         url = self._api_url(path) + "/" + object_id
-
-        LOG.debug("Request DELETE: %s" % url)
-        response = self._session.delete(url, verify=False)
-        LOG.debug(response)
-        return response
+        return self._request('DELETE', path, url)
 
     def do_post(self, path, data):
         url = self._api_url(path)
         headers = {'Content-type': 'application/json'}
-
-        LOG.debug("Request POST: %s" % url)
-        response = self._session.post(url, data, headers=headers, verify=False)
-        LOG.debug(response)
-        return response
+        return self._request('POST', path, url, data=data, headers=headers)
 
     def do_put(self, path, data):
         url = self._api_url(path)
         headers = {'Content-type': 'application/json'}
-        LOG.debug("Request PUT: %s" % url)
-
-        response = self._session.put(url, data, headers=headers, verify=False)
-        LOG.debug(response)
-        return response
+        return self._request('PUT', path, url, data=data, headers=headers)
 
 
 class OmsController(object):
@@ -194,6 +333,7 @@ class OmsController(object):
         self.logger = logging.getLogger(__name__)
 
         self._made_remote_dirs = []
+        self.support_bundle = None
 
     def login(self):
         self.rest_client.login()
@@ -339,15 +479,77 @@ class OmsController(object):
         resp = self.rest_client.do_post("bundles", spec)
         return resp
 
-    def get_support_bundle(self, spec, dest):
+    def get_support_bundle(self, spec, dest, chunk_size=1024 * 1024, max_resumes=5):
+        """Streams the bundle to dest/<name>.part in chunk_size blocks and
+        renames it when complete. A dropped connection resumes with a Range
+        request from the bytes already written, also those of an earlier run.
+        The sha256 and size are kept in self.support_bundle
+        """
         resp = self.rest_client.do_post("bundles", spec)
         fileName = resp.text.split('/')[-1][0:-1]
-        with open('%s/%s' % (dest, fileName), 'wb') as handle:
-            resp = self.rest_client.do_get("bundle/{}".format(fileName))
-            for block in resp.iter_content(1024):
-                if not block:
-                    break
-                handle.write(block)
+        path = os.path.join(dest, fileName)
+        part = path + '.part'
+
+        sha256 = hashlib.sha256()
+        offset = 0
+        if os.path.isfile(part):
+            with open(part, 'rb') as handle:
+                for block in iter(lambda: handle.read(chunk_size), b''):
+                    sha256.update(block)
+                    offset += len(block)
+
+        resumes = 0
+        with open(part, 'ab') as handle:
+            while True:
+                headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+                expected = None
+                resp = None
+                try:
+                    resp = self.rest_client.do_get("bundle/{}".format(fileName), stream=True, headers=headers)
+
+                    if resp.status_code == 416 and offset:
+                        break
+                    if resp.status_code not in (200, 206):
+                        raise RestClientError("Failed to download bundle {} status code: {}".format(
+                            fileName, resp.status_code))
+
+                    if resp.status_code == 200 and offset:
+                        # range ignored, start over
+                        handle.truncate(0)
+                        sha256 = hashlib.sha256()
+                        offset = 0
+
+                    if resp.headers.get('Content-Length'):
+                        expected = offset + int(resp.headers['Content-Length'])
+
+                    for block in resp.iter_content(chunk_size):
+                        handle.write(block)
+                        sha256.update(block)
+                        offset += len(block)
+
+                    if expected is None or offset >= expected:
+                        break
+                    LOG.debug("Bundle %s ended at %d of %d bytes" % (fileName, offset, expected))
+                except requests.RequestException as e:
+                    LOG.debug("Bundle %s dropped at %d bytes: %s" % (fileName, offset, e))
+                except RestClientError:
+                    if resp is not None and resp.status_code not in self.rest_client._RETRY_STATUS_CODES:
+                        raise
+
+                if resumes >= max_resumes:
+                    raise RestClientError("Failed to download bundle {} after {} resumes".format(fileName, resumes))
+                resumes += 1
+                handle.flush()
+                time.sleep(2 ** resumes)
+
+            handle.flush()
+            os.fsync(handle.fileno())
+
+        os.rename(part, path)
+
+        self.support_bundle = {'path': path, 'size': offset,
+                               'sha256': sha256.hexdigest(), 'resumes': resumes}
+        LOG.debug("Bundle: %s" % self.support_bundle)
         return fileName
 
     def validate(self, type, spec):
@@ -514,7 +716,12 @@ class VioOms(object):
         self.cluster_spec_file = module.params['cluster_spec_json']
         self.ds_list = module.params['vio_mgmt_datastores']
         self.desired_state = module.params['state']
-        self.oms = OmsController(self.server, self.user, self.password)
+        self.placement = None
+
+        try:
+            self.oms = OmsController(self.server, self.user, self.password)
+        except RestClientError as e:
+            self.module.fail_json(msg=str(e))
 
     def _parse_response(self, response, key):
         resp_content = json.loads(response.content)
@@ -633,20 +840,135 @@ class VioOms(object):
         log(json_data)
         return json_data
 
+    def datastore_free_space(self):
+        """Returns dict of vio_mgmt_datastores name: free GB, from the
+        summary.freeSpace (bytes) vCenter reports for each datastore, read
+        with one PropertyCollector call as the OMS login
+        """
+        log()
+        context = None
+        if not self.module.params['validate_certs']:
+            context = ssl._create_unverified_context()
+
+        try:
+            si = SmartConnect(host=self.module.params['vcenter_hostname'], user=self.user,
+                              pwd=self.password, sslContext=context)
+        except Exception as e:
+            msg = "Failed to connect to vCenter {} for datastore capacity: {}".format(
+                self.module.params['vcenter_hostname'], str(e))
+            log(msg)
+            self.module.fail_json(msg=msg)
+
+        try:
+            content = si.RetrieveContent()
+            view = content.viewManager.CreateContainerView(content.rootFolder, [vim.Datastore], True)
+            traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+                name='view', path='view', skip=False, type=vim.view.ContainerView)
+            object_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True,
+                                                                   selectSet=[traversal_spec])
+            property_spec = vmodl.query.PropertyCollector.PropertySpec(
+                type=vim.Datastore, pathSet=['name', 'summary.freeSpace'], all=False)
+            filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[object_spec],
+                                                                   propSet=[property_spec])
+            objs = content.propertyCollector.RetrieveContents([filter_spec])
+            view.Destroy()
+        finally:
+            Disconnect(si)
+
+        free_space = {}
+        for obj in objs:
+            props = dict((prop.name, prop.val) for prop in obj.propSet)
+            if props.get('name') in self.ds_list:
+                free_space[props['name']] = props['summary.freeSpace'] / float(1024 ** 3)
+
+        missing = [ds for ds in self.ds_list if ds not in free_space]
+        if missing:
+            msg = "Datastores not found in vCenter {}: {}".format(self.module.params['vcenter_hostname'],
+                                                                 missing)
+            log(msg)
+            self.module.fail_json(msg=msg)
+
+        log(free_space)
+        return free_space
+
+    def node_disk_size(self, node):
+        """Returns GB the plan node takes on its datastore, its own disk size
+        or the disk of its flavor, node_disk_size when the plan has neither
+        """
+        flavor = node.get('flavor')
+        sizes = [node.get('diskSize'), node.get('disk')]
+        if isinstance(flavor, dict):
+            sizes.append(flavor.get('disk'))
+
+        for size in sizes:
+            try:
+                if size and float(size) > 0:
+                    return float(size)
+            except (TypeError, ValueError):
+                continue
+
+        return float(self.module.params['node_disk_size'])
+
+    def node_disk_sizes(self, plan_nodes):
+        return dict((index, self.node_disk_size(node)) for index, node in enumerate(plan_nodes))
+
+    def place_nodes(self, plan_nodes, free_space):
+        """Returns dict of node index: datastore, each node on the datastore
+        with the most free space left after the reserve
+        """
+        reserve = self.module.params['datastore_reserve']
+        remaining = dict((ds, free - reserve) for ds, free in free_space.items())
+        sizes = self.node_disk_sizes(plan_nodes)
+
+        placement = {}
+        for index in sorted(sizes, key=lambda i: sizes[i], reverse=True):
+            datastore = max(self.ds_list, key=lambda ds: remaining[ds])
+            if remaining[datastore] < sizes[index]:
+                msg = "Not enough free space for node {} ({} GB) on datastores: {}".format(
+                    plan_nodes[index].get('name', index), sizes[index], self.ds_list)
+                log(msg)
+                self.module.fail_json(msg=msg, placement=self.placement_report(plan_nodes, placement,
+                                                                             sizes, free_space))
+            remaining[datastore] -= sizes[index]
+            placement[index] = datastore
+
+        return placement, sizes
+
+    def placement_report(self, plan_nodes, placement, sizes, free_space):
+        nodes = [{'name': plan_nodes[i].get('name', i), 'datastore': ds, 'disk_gb': sizes[i]}
+                 for i, ds in sorted(placement.items())]
+        datastores = {}
+        for ds in self.ds_list:
+            planned = sum(sizes[i] for i, d in placement.items() if d == ds)
+            datastores[ds] = {'planned_gb': planned}
+            if free_space:
+                datastores[ds]['free_gb'] = round(free_space[ds], 1)
+        return {'nodes': nodes, 'datastores': datastores}
+
     def update_attr_plan(self):
         log()
         plan = self.create_plan()
         attr_plan = plan['attributes']['plan']
         attr_plan_json = json.loads(attr_plan)
-        plan_nodes = [at for at in attr_plan_json]
+        plan_nodes = [at for at in attr_plan_json if 'targetSystemDs' in at]
+
+        if self.module.params['datastore_placement'] == 'capacity':
+            free_space = self.datastore_free_space()
+            placement, sizes = self.place_nodes(plan_nodes, free_space)
+        else:
+            free_space = None
+            ds_que = collections.deque(self.ds_list)
+            placement = {}
+            for index in range(len(plan_nodes)):
+                placement[index] = ds_que[0]
+                ds_que.rotate(1)
+            sizes = self.node_disk_sizes(plan_nodes)
 
-        ds_que = collections.deque(self.ds_list)
+        for index, node in enumerate(plan_nodes):
+            node['targetSystemDs'] = placement[index]
 
-        for i in plan_nodes:
-            for k,v in i.items():
-                if k == 'targetSystemDs':
-                    i[k] = ds_que[0]
-                    ds_que.rotate(1)
+        self.placement = self.placement_report(plan_nodes, placement, sizes, free_space)
+        log(self.placement)
 
         attr_plan_str = json.dumps(attr_plan_json)
         plan['attributes']['plan'] = attr_plan_str
@@ -657,6 +979,9 @@ class VioOms(object):
         converted_plan = self.update_attr_plan()
         log(converted_plan)
 
+        if self.module.check_mode:
+            self.module.exit_json(changed=True, placement=self.placement)
+
         create = self.oms.create_deployment_by_spec(converted_plan)
         log(create.status_code)
 
@@ -665,8 +990,119 @@ class VioOms(object):
             log(msg)
             self.module.fail_json(msg=msg)
 
-        self.module.exit_json(changed=True, result=create.status_code)
+        deployment = None
+        if self.module.params['wait']:
+            deployment = self.wait_for_deployment(self.task_id(create))
+
+        self.module.exit_json(changed=True, result=create.status_code, deployment=deployment,
+                              placement=self.placement, oms_requests=self.oms.rest_client.report())
+
+    def task_id(self, response):
+        log()
+        try:
+            content = json.loads(response.content)
+        except ValueError:
+            return None
+
+        if isinstance(content, dict):
+            content = content.get('id', content.get('taskId'))
+        log(content)
+        return content
+
+    def deployment_progress(self):
+        """Returns cluster status and dict of node name: status"""
+        resp = self.oms.list_deployment(self.cluster_name)
+        if resp.status_code != 200:
+            return None, {}
+
+        try:
+            cluster = json.loads(resp.content)
+        except ValueError:
+            return None, {}
+
+        nodes = {}
+        for node_group in cluster.get('nodeGroups') or []:
+            for node in node_group.get('instances') or []:
+                nodes[node.get('name')] = node.get('status')
+
+        return cluster.get('status'), nodes
 
+    def task_progress(self, task_id):
+        """Returns task status, progress and message"""
+        if task_id is None:
+            return None, None, None
+        try:
+            task = self.oms.get_task(task_id)
+        except ValueError:
+            return None, None, None
+
+        return task.get('status'), task.get('progress'), task.get('progressMsg') or task.get('errorMessage')
+
+    def wait_for_deployment(self, task_id, initial_sleep=5, max_sleep=60):
+        """Polls the deployment task and cluster until RUNNING, sleeps
+        longer while nothing changes and starts over on progress
+        Returns status, duration, polls and phase timings
+        """
+        log(task_id)
+        start = time.time()
+        deadline = start + self.module.params['wait_timeout']
+        sleep = initial_sleep
+        polls = 0
+        phases = []
+        last = None
+        nodes = {}
+        status = None
+
+        while time.time() < deadline:
+            polls += 1
+            status, node_status = self.deployment_progress()
+            task_status, progress, progress_msg = self.task_progress(task_id)
+            offset = round(time.time() - start, 2)
+
+            progressed = False
+            for name, node in node_status.items():
+                if nodes.get(name) != node:
+                    log("Node: {} Status: {}".format(name, node))
+                    progressed = True
+            nodes = node_status
+
+            current = (status, task_status, progress_msg)
+            if current != last:
+                log("Cluster: {} Task: {} Progress: {} {}".format(status, task_status, progress, progress_msg))
+                if phases:
+                    phases[-1]['duration'] = round(offset - phases[-1]['start'], 2)
+                phases.append({'cluster_status': status, 'task_status': task_status,
+                               'progress': progress, 'msg': progress_msg, 'start': offset})
+                last = current
+                progressed = True
+
+            if progressed:
+                sleep = initial_sleep
+            else:
+                sleep = min(sleep * 1.5, max_sleep)
+
+            result = {'task_id': task_id, 'status': status, 'duration': offset,
+                      'polls': polls, 'phases': phases, 'nodes': nodes}
+
+            if status == 'RUNNING':
+                phases[-1]['duration'] = 0
+                return result
+
+            if status == 'PROVISION_ERROR' or task_status == 'FAILED':
+                msg = "Deployment failed cluster: {} task: {} {}".format(status, task_status, progress_msg)
+                log(msg)
+                self.module.fail_json(msg=msg, changed=True, deployment=result,
+                                      oms_requests=self.oms.rest_client.report())
+
+            time.sleep(min(sleep, max(deadline - time.time(), 0)))
+
+        msg = "Timed out waiting for deployment, cluster status: {}".format(status)
+        log(msg)
+        self.module.fail_json(msg=msg, changed=True,
+                              deployment={'task_id': task_id, 'status': status, 'polls': polls,
+                                          'duration': round(time.time() - start, 2), 'phases': phases,
+                                          'nodes': nodes},
+                              oms_requests=self.oms.rest_client.report())
 
     def check_deployment_state(self):
         log()
@@ -699,6 +1135,9 @@ class VioOms(object):
 
     def delete_deployment(self):
         log()
+        if self.module.check_mode:
+            self.module.exit_json(changed=True)
+
         delete_deploy = self.oms.delete_deployment(self.cluster_name)
         if delete_deploy.status_code != 202:
             msg="Failed deleting deployment: {}".format(delete_deploy.status_code)
@@ -706,7 +1145,8 @@ class VioOms(object):
             self.module.fail_json(msg=msg)
         log(delete_deploy.status_code)
 
-        self.module.exit_json(changed=True, result=delete_deploy.status_code)
+        self.module.exit_json(changed=True, result=delete_deploy.status_code,
+                              oms_requests=self.oms.rest_client.report())
 
     def state_update_deployment(self):
         self.module.exit_json(changed=False, msg="update currently not supported")
@@ -725,8 +1165,12 @@ class VioOms(object):
             }
         }
 
-        current_state = self.check_deployment_state()
-        states[self.desired_state][current_state]()
+        try:
+            current_state = self.check_deployment_state()
+            states[self.desired_state][current_state]()
+        except RestClientError as e:
+            log(str(e))
+            self.module.fail_json(msg=str(e), oms_requests=self.oms.rest_client.report())
 
 
 def main():
@@ -737,14 +1181,27 @@ def main():
         cluster_spec_json=dict(required=True, type='str'),
         vio_mgmt_datastores=dict(required=True, type='list'),
         vio_deployment_name=dict(required=True, type='str'),
+        wait=dict(default=False, type='bool'),
+        wait_timeout=dict(default=7200, type='int'),
+        datastore_placement=dict(default='round_robin', choices=['round_robin', 'capacity'], type='str'),
+        vcenter_hostname=dict(required=False, type='str'),
+        validate_certs=dict(default=True, type='bool'),
+        node_disk_size=dict(default=80, type='int'),
+        datastore_reserve=dict(default=20, type='int'),
         state=dict(default='present', choices=['present', 'absent'], type='str'),
     )
 
-    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
 
     if not IMPORTS:
         module.fail_json(msg='python modules failed to import required for this module')
 
+    if module.params['datastore_placement'] == 'capacity':
+        if not module.params['vcenter_hostname']:
+            module.fail_json(msg='vcenter_hostname is required for datastore_placement capacity')
+        if not HAS_PYVMOMI:
+            module.fail_json(msg='pyvmomi is required for datastore_placement capacity')
+
     oms_deploy = VioOms(module)
     oms_deploy.run_state()
 
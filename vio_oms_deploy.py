@@ -67,7 +67,24 @@ options:
     ovftool_path:
         description:
             - The path where the ovftool is installed
+        required: True
         ex: /usr/local/bin/ovftool
+    deploy_method:
+        description:
+            - Only ovftool is supported, it binds the vService dependency of the OMS vApp
+              which the native import through the vSphere api cannot do. native is rejected
+        choices: ['ovftool', 'native']
+        default: ovftool
+    verify_manifest:
+        description:
+            - Check the files of the ova against its manifest before deploying, an ova
+              without a manifest is deployed with a warning
+        default: False
+    hash_cache:
+        description:
+            - File recording verified ovas and their sha256 by path, size and mtime, so an
+              unchanged ova is only hashed once
+        default: ~/.ansible/ova_hash_cache.json
     path_to_ova:
         description:
             - The path where the ova is located
@@ -191,8 +208,6 @@ object_id:
 '''
 
 try:
-    import time
-    import requests
     from pyVmomi import vim, vmodl
     IMPORTS = True
 except ImportError:
@@ -200,73 +215,23 @@ except ImportError:
 
 vc = {}
 
-def check_oms_api(module):
+
+def wait_for_api(module):
     url = "https://{}:8443/oms/api/hello".format(module.params['oms_ip'])
-    try:
-        resp = requests.get(url=url, verify=False)
-    except requests.exceptions.ConnectionError:
-        return False
-    return resp.status_code, resp.content
-
-def wait_for_api(module, sleep_time=15):
-    status_poll_count = 0
-    while status_poll_count < 30:
-        api_status = check_oms_api(module)
-        if api_status:
-            if api_status[0] == 200:
-                return True
-            else:
-                status_poll_count += 1
-                time.sleep(sleep_time)
-        else:
-            status_poll_count += 1
-            time.sleep(sleep_time)
-
-        if status_poll_count == 30:
-            return False
-
-def wait_for_vm(vm, sleep_time=15):
-    vm_pool_count = 0
-    while vm_pool_count < 30:
-
-        connected = (vm.runtime.connectionState == 'connected')
-
-        if connected:
-            powered_on = (vm.runtime.powerState == 'poweredOn')
-
-            if powered_on:
-                return True
-            else:
-                vm_pool_count += 1
-                time.sleep(sleep_time)
-        else:
-            vm_pool_count += 1
-            time.sleep(sleep_time)
-
-        if vm_pool_count == 30:
-            return False
+
+    probe = ReadinessProbe()
+    ready = probe.wait(url)
+    vc['api_probe'] = probe.report()
+
+    return ready
 
 def find_virtual_machine(content, searched_vm_name):
-    virtual_machines = get_all_objs(content, [vim.VirtualMachine])
-    for vm in virtual_machines:
-        if vm.name == searched_vm_name:
+    virtual_machines = get_all_objs_props(content, [vim.VirtualMachine])
+    for vm, vm_props in virtual_machines.items():
+        if vm_props['name'] == searched_vm_name:
             return vm
     return None
 
-def get_all_objs(content, vimtype):
-    obj = {}
-    container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-    for managed_object_ref in container.view:
-        obj.update({managed_object_ref: managed_object_ref.name})
-    return obj
-
-def find_vcenter_object_by_name(content, vimtype, name):
-    objts = get_all_objs(content, [vimtype])
-    for objt in objts:
-        if objt.name == name:
-            return objt
-    return None
-
 def get_resgroup(content, name):
     resgroup = find_vcenter_object_by_name(content, vim.VirtualApp, name)
     return resgroup
@@ -301,13 +266,40 @@ def state_exit_unchanged(module):
 
     module.exit_json(changed=False, object_id=vapp_id, object_name=vapp_name, msg="EXIT UNCHANED")
 
+def ova_properties(module):
+    return {
+        'viouser_passwd': module.params['viouser_password'],
+        'vami.domain.management-server': module.params['oms_hostname'],
+        'vami.ip0.management-server': module.params['oms_ip'],
+        'vami.netmask0.management-server': module.params['oms_subnet'],
+        'vami.gateway.management-server': module.params['oms_gateway'],
+        'vami.DNS.management-server': '{},{}'.format(module.params['oms_dns_server_ip'][0],
+                                                     module.params['oms_dns_server_ip'][1]),
+        'vami.searchpath.management-server': module.params['oms_search_path'],
+        'ntpServer': module.params['oms_ntp_server'],
+        'syslogServer': module.params['oms_syslog_server'],
+        'syslogProtocol': module.params['oms_syslog_protocol'],
+        'syslogPort': module.params['oms_syslog_port'],
+    }
+
+def verify_ova_manifest(module):
+    ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
+
+    deployer = OvaDeployer(module, vc['content'], ova_file, hash_cache=module.params['hash_cache'])
+    vc['manifest'] = deployer.verify_manifest()
+
 def state_create_vapp(module):
+    if module.params['verify_manifest']:
+        verify_ova_manifest(module)
+
     ovftool_exec = '{}/ovftool'.format(module.params['ovftool_path'])
     ova_file = '{}/{}'.format(module.params['path_to_ova'], module.params['ova_file'])
     vi_string = 'vi://{}:{}@{}/{}/host/{}/'.format(module.params['username'],
                                                    module.params['password'], module.params['hostname'],
                                                    module.params['datacenter'], module.params['cluster'])
 
+    ova_props = ['--prop:{}={}'.format(k, v) for k, v in ova_properties(module).items()]
+
     ova_tool_result = module.run_command([ovftool_exec,
                                           '--acceptAllEulas',
                                           '--skipManifestCheck',
@@ -318,20 +310,9 @@ def state_create_vapp(module):
                                           '--diskMode={}'.format(module.params['disk_mode']),
                                           '--datastore={}'.format(module.params['datastore']),
                                           '--network={}'.format(module.params['network']),
-                                          '--name={}'.format(module.params['vmname']),
-                                          '--prop:viouser_passwd={}'.format(module.params['viouser_password']),
-                                          '--prop:vami.domain.management-server={}'.format(module.params['oms_hostname']),
-                                          '--prop:vami.ip0.management-server={}'.format(module.params['oms_ip']),
-                                          '--prop:vami.netmask0.management-server={}'.format(module.params['oms_subnet']),
-                                          '--prop:vami.gateway.management-server={}'.format(module.params['oms_gateway']),
-                                          '--prop:vami.DNS.management-server={},{}'.format(module.params['oms_dns_server_ip'][0],
-                                                                                           module.params['oms_dns_server_ip'][1]),
-                                          '--prop:vami.searchpath.management-server={}'.format(module.params['oms_search_path']),
-                                          '--prop:ntpServer={}'.format(module.params['oms_ntp_server']),
-                                          '--prop:syslogServer={}'.format(module.params['oms_syslog_server']),
-                                          '--prop:syslogProtocol={}'.format(module.params['oms_syslog_protocol']),
-                                          '--prop:syslogPort={}'.format(module.params['oms_syslog_port']),
-                                          ova_file,
+                                          '--name={}'.format(module.params['vmname'])] +
+                                         ova_props +
+                                         [ova_file,
                                           vi_string])
 
     if ova_tool_result[0] != 0:
@@ -340,7 +321,6 @@ def state_create_vapp(module):
     return ova_tool_result[0]
 
 
-
 def main():
     argument_spec = vmware_argument_spec()
 
@@ -348,6 +328,9 @@ def main():
         dict(
             vmname=dict(required=True, type='str'),
             ovftool_path=dict(required=True, type='str'),
+            deploy_method=dict(default='ovftool', choices=['ovftool', 'native']),
+            verify_manifest=dict(default=False, type='bool'),
+            hash_cache=dict(default='~/.ansible/ova_hash_cache.json', type='str'),
             path_to_ova=dict(required=True, type='str'),
             ova_file=dict(required=True, type='str'),
             datacenter=dict(required=True, type='str'),
@@ -375,7 +358,12 @@ def main():
     if not IMPORTS:
         module.fail_json(msg="Failed to import modules")
 
-    content = connect_to_api(module)
+    if module.params['deploy_method'] == 'native':
+        module.fail_json(msg="deploy_method native cannot bind the vService dependency of the OMS vApp, "
+                             "use ovftool")
+
+    content = connect_to_api_cached(module)
+    vc['content'] = content
 
     oms_vapp = get_resgroup(content, module.params['vmname'])
 
@@ -401,28 +389,40 @@ def main():
 
     oms_vapp_states[desired_state][current_state](module)
 
-    oms_mgmt_svr = find_virtual_machine(content, 'management-server')
+    oms_vapp = get_resgroup(content, module.params['vmname'])
+
+    try:
+        oms_mgmt_svr = [vm for vm in oms_vapp.vm if vm.name == 'management-server'][0]
+    except (AttributeError, IndexError):
+        oms_mgmt_svr = None
 
     if not oms_mgmt_svr:
         msg = "Failed to find oms management server"
         module.fail_json(msg=msg)
 
-    if not wait_for_vm(oms_mgmt_svr):
-        msg = "Failed waiting to power on management server"
+    vc['vm_ready'] = wait_for_vm(oms_mgmt_svr)
+
+    if not vc['vm_ready']:
+        msg = "Failed waiting for management server to power on and report an ip address"
         module.fail_json(msg=msg)
 
     if not wait_for_api(module):
         msg = "Failed waiting for OMS api"
-        module.fail_json(msg=msg)
+        module.fail_json(msg=msg, api_probe=vc.get('api_probe'))
 
     module.exit_json(changed=True,
                      power_state=True,
                      api_status=True,
-                     object_id=oms_mgmt_svr._moId)
+                     object_id=oms_mgmt_svr._moId,
+                     deploy=vc.get('deploy'),
+                     manifest=vc.get('manifest'),
+                     vm_ready=vc.get('vm_ready'),
+                     api_probe=vc.get('api_probe'))
 
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()
@@ -115,7 +115,7 @@ def get_instance_ext_id(extention_keys):
 def check_extention_state(module):
     state = 'absent'
 
-    content = connect_to_api(module)
+    content = connect_to_api_cached(module)
 
     vc['content'] = content
 
@@ -175,6 +175,7 @@ def main():
 
 from ansible.module_utils.basic import *
 from ansible.module_utils.vmware import *
+from ansible.module_utils.vmware_extras import *
 
 if __name__ == '__main__':
     main()